@@ -0,0 +1,3 @@
+# Бенчмарки консольного трекера и веб-приложения на синтетических данных.
+# Запуск: python -m benchmarks.run --help
+# Запись из нескольких процессов: python -m benchmarks.stress --help
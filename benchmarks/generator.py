@@ -0,0 +1,125 @@
+import random
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Tuple
+
+from tracker.models import Transaction
+from tracker.storage import Storage
+
+START_DATE = date(2020, 1, 1)
+# фиксированное время создания — одинаковые данные при каждом запуске
+CREATED_AT = datetime(2020, 1, 1, 12, 0, 0)
+INCOME_SHARE = 0.2
+DJANGO_BATCH_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    users: int = 3
+    categories: int = 20
+    transactions: int = 100_000
+    years: int = 3
+    seed: int = 42
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def category_names(spec: SyntheticSpec) -> List[Tuple[str, bool]]:
+    # (название, доходная ли); доходных категорий примерно пятая часть
+    income_count = max(1, spec.categories // 5)
+    return [
+        (f"категория-{index:03d}", index < income_count)
+        for index in range(spec.categories)
+    ]
+
+
+def iter_synthetic_rows(
+    spec: SyntheticSpec,
+) -> Iterator[Tuple[int, date, int, str, str, str]]:
+    # (номер пользователя, дата, сумма в копейках, тип, категория, комментарий).
+    # Один и тот же spec всегда даёт одну и ту же последовательность.
+    rng = random.Random(spec.seed)
+    categories = category_names(spec)
+    income = [name for name, is_income in categories if is_income]
+    expense = [name for name, is_income in categories if not is_income] or income
+    days = max(1, spec.years * 365)
+
+    for index in range(spec.transactions):
+        user = rng.randrange(spec.users)
+        tx_date = START_DATE + timedelta(days=rng.randrange(days))
+        if rng.random() < INCOME_SHARE:
+            kind = "income"
+            category = rng.choice(income)
+            cents = rng.randint(10_000, 20_000_000)
+        else:
+            kind = "expense"
+            category = rng.choice(expense)
+            cents = rng.randint(100, 2_000_000)
+        yield user, tx_date, cents, kind, category, f"синтетика #{index}"
+
+
+def iter_tracker_transactions(spec: SyntheticSpec) -> Iterator[Transaction]:
+    # консольный трекер однопользовательский — пишем строки всех пользователей
+    for _, tx_date, cents, kind, category, description in iter_synthetic_rows(spec):
+        yield Transaction(
+            id=None,
+            date=tx_date,
+            amount=cents / 100,
+            kind=kind,
+            category=category,
+            description=description,
+            created_at=CREATED_AT,
+        )
+
+
+def populate_tracker(storage: Storage, spec: SyntheticSpec) -> int:
+    return storage.add_transactions(iter_tracker_transactions(spec))
+
+
+def populate_django(spec: SyntheticSpec) -> list:
+    # Пользователи bench-0..N-1 со своими категориями и транзакциями.
+    # Django должен быть уже настроен (django.setup()).
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+
+    from finance import rollups
+    from finance.models import Category, Transaction as WebTransaction
+
+    User = get_user_model()
+    users = [
+        User.objects.create_user(f"bench-{index}", password="bench")
+        for index in range(spec.users)
+    ]
+    categories = {}
+    for user_index, user in enumerate(users):
+        for name, is_income in category_names(spec):
+            categories[user_index, name] = Category.objects.create(
+                owner=user, name=name, is_income=is_income
+            )
+
+    rows = iter_synthetic_rows(spec)
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(rows, DJANGO_BATCH_SIZE))
+            if not chunk:
+                break
+            WebTransaction.objects.bulk_create(
+                [
+                    WebTransaction(
+                        owner=users[user_index],
+                        date=tx_date,
+                        amount=Decimal(cents) / 100,
+                        kind=kind,
+                        category=categories[user_index, category],
+                        description=description,
+                    )
+                    for user_index, tx_date, cents, kind, category, description in chunk
+                ]
+            )
+        # bulk_create не шлёт сигналы — помесячные итоги строим целиком
+        rollups.rebuild()
+    return users
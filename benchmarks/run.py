@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from tracker.reports import HAS_NUMPY, compute_summary
+from tracker.storage import Storage
+
+from .generator import CREATED_AT, SyntheticSpec, populate_django, populate_tracker
+
+ROOT = Path(__file__).resolve().parent.parent
+SUITES = ("tracker", "web")
+ADD_TRANSACTION_NUMBER = 200
+
+
+def measure(
+    func: Callable[[], object],
+    repeat: int,
+    number: int = 1,
+    setup: Optional[Callable[[], object]] = None,
+) -> Dict[str, float]:
+    # Время одной операции (секунды): func вызывается number раз подряд,
+    # замер повторяется repeat раз; setup выполняется вне замера.
+    if setup is not None:
+        setup()
+    func()  # прогрев: кэши SQLite, импорт модулей, компиляция шаблонов
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+    }
+
+
+def remove_database(path: Path) -> None:
+    # База из прошлого прогона в том же --workdir: без удаления данные
+    # дописались бы второй раз, а замеры шли бы на удвоенном объёме
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def run_tracker(workdir: Path, spec: SyntheticSpec, repeat: int) -> Dict[str, dict]:
+    from tracker.models import Transaction
+
+    results = {}
+    remove_database(workdir / "tracker.db")
+    remove_database(workdir / "tracker_add.db")
+    with Storage(workdir / "tracker.db") as storage:
+        populate_tracker(storage, spec)
+
+        results["tracker.list_transactions"] = measure(
+            storage.list_transactions, repeat
+        )
+        results["tracker.list_first_page"] = measure(
+            lambda: list(storage.iter_transactions(limit=50)), repeat
+        )
+        results["tracker.load_batch"] = measure(storage.load_batch, repeat)
+        results["tracker.summarize[sql]"] = measure(storage.summarize, repeat)
+
+        batch = storage.load_batch()
+        results["tracker.compute_summary[python]"] = measure(
+            lambda: compute_summary(batch, engine="python"), repeat
+        )
+        if HAS_NUMPY:
+            results["tracker.compute_summary[numpy]"] = measure(
+                lambda: compute_summary(batch, engine="numpy"), repeat
+            )
+
+    # одиночные вставки — в отдельную пустую базу, чтобы не менять данные
+    # остальных сценариев
+    with Storage(workdir / "tracker_add.db") as storage:
+        tx = Transaction(
+            id=None,
+            date=date(2024, 1, 1),
+            amount=123.45,
+            kind="expense",
+            category="категория-001",
+            description="бенчмарк",
+            created_at=CREATED_AT,
+        )
+        results["tracker.add_transaction"] = measure(
+            lambda: storage.add_transaction(tx),
+            repeat,
+            number=ADD_TRANSACTION_NUMBER,
+        )
+    return results
+
+
+def setup_django(workdir: Path) -> None:
+    sys.path.insert(0, str(ROOT / "finance_site"))
+    remove_database(workdir / "finance.sqlite3")
+    os.environ["FINANCE_BENCH_DB"] = str(workdir / "finance.sqlite3")
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", verbosity=0)
+
+
+def run_web(workdir: Path, spec: SyntheticSpec, repeat: int) -> Dict[str, dict]:
+    setup_django(workdir)
+
+    from django.core.cache import cache
+    from django.test import Client
+
+    users = populate_django(spec)
+    client = Client()
+    client.force_login(users[0])
+
+    def get(url: str) -> Callable[[], object]:
+        def request():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url}: статус {response.status_code}")
+            return response
+
+        return request
+
+    period = f"?from={date(2021, 3, 15)}&to={date(2022, 6, 10)}"
+    return {
+        "web.transaction_list": measure(get("/"), repeat),
+        "web.transaction_list[cold]": measure(get("/"), repeat, setup=cache.clear),
+        "web.transaction_list[period]": measure(
+            get("/" + period), repeat, setup=cache.clear
+        ),
+        # форма транзакции — выпадающий список категорий из кэша
+        "web.transaction_form": measure(get("/add/"), repeat),
+        "web.transaction_form[cold]": measure(
+            get("/add/"), repeat, setup=cache.clear
+        ),
+        "web.category_list": measure(get("/categories/"), repeat),
+        "web.category_list[cold]": measure(
+            get("/categories/"), repeat, setup=cache.clear
+        ),
+        # не web.category_form: так в старых результатах назывался /add/
+        "web.category_create": measure(get("/categories/add/"), repeat),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], max_slowdown: float
+) -> List[str]:
+    # Сравнение медиан с прошлым прогоном; возвращает замедлившиеся сценарии.
+    regressions = []
+    print(f"{'Сценарий':<36} {'было, мс':>10} {'стало, мс':>10} {'x':>6}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        ratio = current["median"] / before["median"] if before["median"] else 0.0
+        mark = ""
+        if ratio > max_slowdown:
+            regressions.append(name)
+            mark = "  <- медленнее"
+        print(
+            f"{name:<36} {before['median'] * 1000:>10.3f} "
+            f"{current['median'] * 1000:>10.3f} {ratio:>6.2f}{mark}"
+        )
+    return regressions
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Бенчмарки трекера и веб-приложения на синтетических данных"
+    )
+    parser.add_argument("--users", type=int, default=SyntheticSpec.users)
+    parser.add_argument("--categories", type=int, default=SyntheticSpec.categories)
+    parser.add_argument(
+        "--transactions", type=int, default=SyntheticSpec.transactions
+    )
+    parser.add_argument("--years", type=int, default=SyntheticSpec.years)
+    parser.add_argument("--seed", type=int, default=SyntheticSpec.seed)
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов замера")
+    parser.add_argument(
+        "--suite",
+        dest="suites",
+        action="append",
+        choices=SUITES,
+        help="Какие наборы запускать (по умолчанию все)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark-results.json"),
+        help="Куда записать результаты (JSON)",
+    )
+    parser.add_argument(
+        "--compare",
+        dest="baseline",
+        type=Path,
+        help="JSON прошлого прогона для сравнения",
+    )
+    parser.add_argument(
+        "--max-slowdown",
+        type=float,
+        default=1.2,
+        help="Допустимое замедление медианы относительно --compare (по умолчанию 1.2)",
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="Каталог для баз (по умолчанию временный, удаляется после прогона)",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if min(args.users, args.categories, args.transactions, args.years) <= 0:
+        parser.error("--users, --categories, --transactions и --years должны быть > 0")
+    if args.repeat <= 0:
+        parser.error("--repeat должен быть больше нуля")
+
+    spec = SyntheticSpec(
+        users=args.users,
+        categories=args.categories,
+        transactions=args.transactions,
+        years=args.years,
+        seed=args.seed,
+    )
+    suites = args.suites or list(SUITES)
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="finance-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results: Dict[str, dict] = {}
+    try:
+        if "tracker" in suites:
+            results.update(run_tracker(workdir, spec, args.repeat))
+        if "web" in suites:
+            results.update(run_web(workdir, spec, args.repeat))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": HAS_NUMPY,
+        },
+        "spec": spec.as_dict(),
+        "results": results,
+    }
+    args.output.write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    for name, result in results.items():
+        print(f"{name:<36} {result['median'] * 1000:>10.3f} мс")
+    print(f"Результаты записаны в {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("spec") != report["spec"]:
+            print("Внимание: параметры данных отличаются от --compare", file=sys.stderr)
+        print()
+        regressions = compare(results, baseline["results"], args.max_slowdown)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
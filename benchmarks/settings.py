@@ -0,0 +1,17 @@
+# Настройки Django для бенчмарков: всё как в finance_site, но база —
+# отдельный файл из FINANCE_BENCH_DB, чтобы не трогать db.sqlite3.
+import os
+
+from finance_site.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("FINANCE_BENCH_DB", "bench.sqlite3"),
+    }
+}
+
+ALLOWED_HOSTS = ["testserver", "127.0.0.1", "localhost"]
+DEBUG = False
+# быстрый хэшер — иначе создание пользователей занимает секунды
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
@@ -0,0 +1,261 @@
+import argparse
+import json
+import multiprocessing
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from itertools import islice
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tracker.spool import Spool
+from tracker.storage import Storage
+
+from .generator import SyntheticSpec, iter_tracker_transactions
+from .run import remove_database
+
+# default — настройки SQLite по умолчанию (журнал отката, ожидание 5 с);
+# concurrent — как tracker --concurrent; spool — писатели кладут сегменты
+# в очередь, один процесс переносит их в базу (как tracker flush --interval)
+MODES = ("default", "concurrent", "spool")
+CONCURRENT_OPTIONS = dict(journal_mode="wal", busy_timeout=30.0, write_retries=5)
+# транзакций на процесс «в запасе» — генератор ленивый, лишнее не создаётся
+ROWS_PER_WRITER = 10**9
+
+
+def storage_options(mode: str) -> dict:
+    return CONCURRENT_OPTIONS if mode in ("concurrent", "spool") else {}
+
+
+def writer(
+    index: int,
+    mode: str,
+    db_path: str,
+    spool_dir: str,
+    batch_size: int,
+    duration: float,
+    start: Event,
+    results: Queue,
+) -> None:
+    # Пишет пачки по batch_size, пока не выйдет время; отказы
+    # («database is locked») считаются, а не прерывают процесс.
+    rows = iter_tracker_transactions(
+        SyntheticSpec(transactions=ROWS_PER_WRITER, seed=index)
+    )
+    if mode == "spool":
+        target = Spool(Path(spool_dir))
+    else:
+        target = Storage(Path(db_path), **storage_options(mode))
+    written = errors = 0
+    latencies: List[float] = []
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        batch = list(islice(rows, batch_size))
+        started = time.perf_counter()
+        try:
+            written += target.add_transactions(batch)
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+    retries = 0
+    if isinstance(target, Storage):
+        retries = target.busy_retries
+        target.close()
+    results.put(
+        {
+            "written": written,
+            "errors": errors,
+            "retries": retries,
+            "latencies": latencies,
+        }
+    )
+
+
+def flusher(
+    db_path: str,
+    spool_dir: str,
+    interval: float,
+    stop: Event,
+    results: Queue,
+) -> None:
+    spool = Spool(Path(spool_dir))
+    flushed = 0
+    with Storage(Path(db_path), **CONCURRENT_OPTIONS) as storage:
+        while not stop.wait(interval):
+            flushed += spool.flush(storage)
+        # остаток после остановки писателей
+        flushed += spool.flush(storage)
+    results.put({"flushed": flushed})
+
+
+def run_mode(
+    mode: str,
+    workdir: Path,
+    processes: int,
+    duration: float,
+    batch_size: int,
+    flush_interval: float,
+) -> Dict[str, float]:
+    db_path = workdir / f"stress-{mode}.db"
+    spool_dir = workdir / f"spool-{mode}"
+    # с прошлого прогона в том же --workdir: иначе строк в базе больше,
+    # чем записано сейчас
+    remove_database(db_path)
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    # схему создаём заранее, чтобы замер не включал миграции
+    Storage(db_path, **storage_options(mode)).close()
+
+    context = multiprocessing.get_context()
+    start = context.Event()
+    stop = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=writer,
+            args=(
+                index,
+                mode,
+                str(db_path),
+                str(spool_dir),
+                batch_size,
+                duration,
+                start,
+                results,
+            ),
+        )
+        for index in range(processes)
+    ]
+    flush_process = None
+    if mode == "spool":
+        flush_process = context.Process(
+            target=flusher,
+            args=(str(db_path), str(spool_dir), flush_interval, stop, results),
+        )
+        flush_process.start()
+    for process in workers:
+        process.start()
+
+    started = time.perf_counter()
+    start.set()
+    reports = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    if flush_process is not None:
+        stop.set()
+        results.get()
+        flush_process.join()
+    # для spool — время до переноса последней строки в базу
+    elapsed = time.perf_counter() - started
+
+    with sqlite3.connect(db_path) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    written = sum(report["written"] for report in reports)
+    if stored != written:
+        raise RuntimeError(f"{mode}: записано {written}, в базе {stored}")
+
+    latencies = sorted(
+        latency for report in reports for latency in report["latencies"]
+    )
+    return {
+        "processes": processes,
+        "batch_size": batch_size,
+        "rows": stored,
+        "seconds": elapsed,
+        "rows_per_second": stored / elapsed,
+        "errors": sum(report["errors"] for report in reports),
+        "retries": sum(report["retries"] for report in reports),
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": (
+            latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+        ),
+    }
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест: запись в одну базу из нескольких процессов"
+    )
+    parser.add_argument("--processes", type=int, default=8, help="Процессов-писателей")
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Сколько секунд писать"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Транзакций в одной записи (1 — как отдельные tracker add)",
+    )
+    parser.add_argument(
+        "--mode",
+        dest="modes",
+        action="append",
+        choices=MODES,
+        help="Какие режимы запускать (по умолчанию все)",
+    )
+    parser.add_argument(
+        "--flush-interval",
+        type=float,
+        default=0.5,
+        help="Период переноса очереди в режиме spool, секунд",
+    )
+    parser.add_argument("--output", type=Path, help="Записать результаты в JSON")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="Каталог для баз (по умолчанию временный, удаляется после прогона)",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if args.processes <= 0 or args.batch_size <= 0:
+        parser.error("--processes и --batch-size должны быть > 0")
+    if args.duration <= 0 or args.flush_interval <= 0:
+        parser.error("--duration и --flush-interval должны быть > 0")
+
+    modes = args.modes or list(MODES)
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="finance-stress-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results: Dict[str, dict] = {}
+    try:
+        for mode in modes:
+            results[mode] = run_mode(
+                mode,
+                workdir,
+                args.processes,
+                args.duration,
+                args.batch_size,
+                args.flush_interval,
+            )
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"{'Режим':<12} {'строк':>9} {'строк/с':>10} {'отказов':>8} "
+        f"{'повторов':>9} {'p50, мс':>9} {'p99, мс':>9}"
+    )
+    for mode, result in results.items():
+        print(
+            f"{mode:<12} {result['rows']:>9} {result['rows_per_second']:>10.0f} "
+            f"{result['errors']:>8} {result['retries']:>9} "
+            f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+        )
+    if args.output:
+        args.output.write_text(
+            json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"Результаты записаны в {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class FinanceConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "finance"
+    verbose_name = "Финансы"
+
+    def ready(self):
+        # регистрируем обработчики сигналов (сброс кэша итогов и т.п.)
+        from . import signals  # noqa: F401
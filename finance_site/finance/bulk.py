@@ -0,0 +1,182 @@
+from django import forms
+from django.db import transaction
+
+from . import rollups
+from .cache import get_categories, invalidate_totals
+from .forms import TransactionForm
+from .models import Category, Transaction
+
+BULK_BATCH_SIZE = 500
+MAX_BULK_ROWS = 5000
+UPDATE_FIELDS = ["date", "amount", "kind", "category", "description"]
+
+
+class OwnerCategories:
+    # Все категории владельца из общего кэша; строки пачки ссылаются
+    # на категорию по id или по имени.
+    def __init__(self, user):
+        categories = [
+            Category(
+                id=cat.id, owner_id=user.pk, name=cat.name, is_income=cat.is_income
+            )
+            for cat in get_categories(user.pk)
+        ]
+        self.by_id = {cat.pk: cat for cat in categories}
+        self.by_name = {cat.name: cat for cat in categories}
+        self.choices = [("", "---------")] + [(cat.pk, cat.name) for cat in categories]
+
+    def resolve(self, value):
+        if isinstance(value, Category):
+            return value
+        value = str(value).strip()
+        if value.isdigit() and int(value) in self.by_id:
+            return self.by_id[int(value)]
+        return self.by_name.get(value)
+
+
+class BulkTransactionForm(TransactionForm):
+    # TransactionForm с проверкой категории по заранее загруженному словарю
+    # вместо запроса к БД на каждую строку.
+    category = forms.CharField(
+        widget=forms.Select(attrs={"class": "form-select form-select-sm"})
+    )
+
+    def __init__(self, *args, categories=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories
+        self.fields["category"].widget.choices = categories.choices
+
+    def clean_category(self):
+        category = self.categories.resolve(self.cleaned_data["category"])
+        if category is None:
+            raise forms.ValidationError("Неизвестная категория.")
+        return category
+
+    def _get_validation_exclusions(self):
+        # внешний ключ проверяет build_forms одним запросом на всю пачку
+        # (check_categories), а не модель — запросом на каждую строку
+        exclude = super()._get_validation_exclusions()
+        exclude.add("category")
+        return exclude
+
+
+BulkTransactionFormSet = forms.formset_factory(BulkTransactionForm, extra=10)
+
+
+def _row_error(index, field, message):
+    # в том же формате, что form.errors.get_json_data()
+    return {
+        "index": index,
+        "errors": {field: [{"message": message, "code": "invalid"}]},
+    }
+
+
+def check_categories(user, indexed_forms):
+    # Словарь категорий собран из кэша, а кэш у каждого процесса свой:
+    # категория могла быть удалена в другом процессе. Одним запросом
+    # отсеиваем такие строки. indexed_forms — пары (номер строки, форма).
+    used = {form.cleaned_data["category"].pk for _, form in indexed_forms}
+    existing = set(
+        Category.objects.filter(owner=user, pk__in=used).values_list("pk", flat=True)
+    )
+    valid, errors = [], []
+    for index, form in indexed_forms:
+        if form.cleaned_data["category"].pk in existing:
+            valid.append(form)
+        else:
+            errors.append(_row_error(index, "category", "Неизвестная категория."))
+    return valid, errors
+
+
+def build_forms(user, rows):
+    # rows — список словарей; строка с "id" — изменение существующей
+    # транзакции. Возвращает валидные формы и ошибки по номерам строк.
+    categories = OwnerCategories(user)
+    checked, errors = [], []
+    # номер строки -> id изменяемой транзакции; id приходит из JSON
+    # числом или строкой, нечисловой — ошибка строки
+    row_ids = {}
+    seen = set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or not row.get("id"):
+            continue
+        try:
+            # через str: true и 1.5 из JSON не превращаются в id
+            pk = int(str(row["id"]).strip())
+        except ValueError:
+            errors.append(_row_error(index, "id", "Некорректный id транзакции."))
+            continue
+        if pk in seen:
+            # второе изменение той же транзакции дважды вычло бы её
+            # прежнюю сумму из итогов по месяцам (save_forms)
+            errors.append(_row_error(index, "id", "Транзакция уже есть в пакете."))
+            continue
+        seen.add(pk)
+        row_ids[index] = pk
+    existing = Transaction.objects.filter(owner=user).in_bulk(set(row_ids.values()))
+
+    failed = {error["index"] for error in errors}
+    for index, row in enumerate(rows):
+        if index in failed:
+            continue
+        if not isinstance(row, dict):
+            errors.append(_row_error(index, "__all__", "Ожидался объект."))
+            continue
+        instance = None
+        if index in row_ids:
+            instance = existing.get(row_ids[index])
+            if instance is None:
+                errors.append(_row_error(index, "id", "Транзакция не найдена."))
+                continue
+        form = BulkTransactionForm(row, instance=instance, categories=categories)
+        if form.is_valid():
+            checked.append((index, form))
+        else:
+            errors.append({"index": index, "errors": form.errors.get_json_data()})
+
+    valid, stale = check_categories(user, checked)
+    errors.extend(stale)
+    errors.sort(key=lambda error: error["index"])
+    return valid, errors
+
+
+def save_forms(user, valid_forms):
+    # Одна транзакция БД: bulk_create для новых, bulk_update для изменённых.
+    # bulk_* не шлют сигналы, поэтому помесячные итоги и кэш обновляем сами.
+    to_create, to_update, removed = [], [], []
+    for form in valid_forms:
+        is_update = form.instance.pk is not None
+        if is_update:
+            # instance загружен через in_bulk, прежние значения известны
+            removed.append(rollups.loaded_rollup_values(form.instance))
+        tx = form.save(commit=False)
+        tx.owner = user
+        (to_update if is_update else to_create).append(tx)
+
+    with transaction.atomic():
+        Transaction.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        Transaction.objects.bulk_update(
+            to_update, UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE
+        )
+        rollups.apply_changes(
+            added=[rollups.rollup_values(tx) for tx in to_create + to_update],
+            removed=removed,
+        )
+    invalidate_totals(user.pk)
+    return len(to_create), len(to_update)
+
+
+def delete_transactions(queryset):
+    # Удаление пачкой: сигнал post_delete для каждой строки не обновляет
+    # итоги, вместо этого — один rollups.rebuild() на владельца.
+    # Возвращает число удалённых транзакций.
+    owner_ids = set(
+        queryset.order_by().values_list("owner_id", flat=True).distinct()
+    )
+    with transaction.atomic(), rollups.deferred(owner_ids):
+        deleted, _ = queryset.delete()
+        for owner_id in owner_ids:
+            rollups.rebuild(owner=owner_id)
+    for owner_id in owner_ids:
+        invalidate_totals(owner_id)
+    return deleted
@@ -0,0 +1,85 @@
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import Category
+
+# Итоги (доходы/расходы) кэшируются по владельцу и параметрам фильтра.
+# Вместо перебора всех ключей при записи меняем «версию» владельца —
+# старые записи просто перестают читаться и вытесняются по таймауту.
+TOTALS_TIMEOUT = getattr(settings, "FINANCE_TOTALS_CACHE_TIMEOUT", 300)
+CATEGORIES_TIMEOUT = getattr(settings, "FINANCE_CATEGORIES_CACHE_TIMEOUT", 3600)
+
+# Лёгкая копия категории для кэша: без экземпляров моделей в pickle
+CachedCategory = namedtuple("CachedCategory", ["id", "name", "is_income"])
+
+
+def _totals_version_key(owner_id):
+    return f"finance:totals-version:{owner_id}"
+
+
+def _totals_version(owner_id):
+    return cache.get_or_set(_totals_version_key(owner_id), time.time_ns, None)
+
+
+def get_totals(owner_id, kind, from_date, to_date, compute):
+    key = "finance:totals:{}:{}:{}:{}:{}".format(
+        owner_id,
+        _totals_version(owner_id),
+        kind or "",
+        from_date or "",
+        to_date or "",
+    )
+    totals = cache.get(key)
+    if totals is None:
+        totals = compute()
+        cache.set(key, totals, TOTALS_TIMEOUT)
+    return totals
+
+
+def invalidate_totals(owner_id):
+    cache.set(_totals_version_key(owner_id), time.time_ns(), None)
+
+
+def is_process_local():
+    # LocMemCache у каждого процесса свой: сброс из manage.py (импорт,
+    # пересчёт итогов) веб-воркеры не видят и показывают старые итоги
+    # до истечения TOTALS_TIMEOUT.
+    return isinstance(caches["default"], LocMemCache)
+
+
+def stale_totals_warning():
+    if not is_process_local():
+        return None
+    return (
+        "Кэш в памяти процесса: веб-воркеры покажут новые итоги не позже "
+        f"чем через {TOTALS_TIMEOUT} с (FINANCE_TOTALS_CACHE_TIMEOUT) "
+        "или после перезапуска"
+    )
+
+
+def _categories_key(owner_id):
+    return f"finance:categories:{owner_id}"
+
+
+def get_categories(owner_id):
+    # Категории владельца, отсортированные по имени. Общий источник для
+    # формы транзакции, списка категорий и автодополнения.
+    key = _categories_key(owner_id)
+    categories = cache.get(key)
+    if categories is None:
+        categories = [
+            CachedCategory(*row)
+            for row in Category.objects.filter(owner_id=owner_id)
+            .order_by("name")
+            .values_list("id", "name", "is_income")
+        ]
+        cache.set(key, categories, CATEGORIES_TIMEOUT)
+    return categories
+
+
+def invalidate_categories(owner_id):
+    cache.delete(_categories_key(owner_id))
@@ -1,12 +1,27 @@
 from django import forms
+from django.urls import reverse
 
+from .cache import get_categories
 from .models import Transaction, Category
 
+# При большем числе категорий форма не выводит их все в <select>,
+# а подгружает варианты через автодополнение
+CATEGORY_SELECT_LIMIT = 200
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    # Варианты для <select> берутся из кэша (cached: {id: CachedCategory}),
+    # а выбранное значение проверяется одним запросом к queryset: кэш у
+    # каждого процесса свой и может ещё хранить категорию, удалённую
+    # в другом процессе.
+    cached = None
+
 
 class TransactionForm(forms.ModelForm):
     class Meta:
         model = Transaction
         fields = ["date", "amount", "kind", "category", "description"]
+        field_classes = {"category": CategoryChoiceField}
         widgets = {
             "date": forms.DateInput(
                 attrs={"type": "date", "class": "form-control"}
@@ -28,10 +43,46 @@ class TransactionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
+        self.category_autocomplete = False
         if user is not None:
-            self.fields["category"].queryset = Category.objects.filter(
-                owner=user
-            ).order_by("name")
+            self._use_cached_categories(user)
+
+    def _use_cached_categories(self, user):
+        categories = get_categories(user.pk)
+        field = self.fields["category"]
+        field.queryset = Category.objects.filter(owner=user)
+        field.cached = {cat.id: cat for cat in categories}
+
+        if len(categories) <= CATEGORY_SELECT_LIMIT:
+            field.choices = [("", field.empty_label)] + [
+                (cat.id, cat.name) for cat in categories
+            ]
+            return
+
+        # в <select> только текущее значение, остальные — через поиск
+        self.category_autocomplete = True
+        choices = [("", field.empty_label)]
+        selected = self["category"].value()
+        if isinstance(selected, Category):
+            selected = selected.pk
+        try:
+            current = field.cached.get(int(selected))
+        except (TypeError, ValueError):
+            current = None
+        if current is not None:
+            choices.append((current.id, current.name))
+        field.choices = choices
+        field.widget.attrs["data-autocomplete-url"] = reverse(
+            "finance:category_autocomplete"
+        )
+
+    def _get_validation_exclusions(self):
+        # категория уже найдена запросом среди категорий владельца — не
+        # даём модели проверять внешний ключ ещё одним запросом
+        exclude = super()._get_validation_exclusions()
+        if getattr(self.fields["category"], "cached", None) is not None:
+            exclude.add("category")
+        return exclude
 
     def clean_amount(self):
         amount = self.cleaned_data.get("amount")
@@ -0,0 +1,232 @@
+import csv
+import sqlite3
+import time
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from finance import rollups
+from finance.cache import invalidate_totals, stale_totals_warning
+from finance.models import Category, Transaction
+
+DEFAULT_BATCH_SIZE = 2000
+CENT = Decimal("0.01")
+_amount_field = Transaction._meta.get_field("amount")
+# наибольшая сумма, которая помещается в DecimalField(max_digits=10, ...)
+MAX_AMOUNT = Decimal(10) ** (_amount_field.max_digits - _amount_field.decimal_places)
+
+
+def _parse_amount(value):
+    # Сумма округляется до копеек, как её сохранит модель. Иначе строка
+    # попала бы в SQLite неокруглённой, а в помесячные итоги — округлённой.
+    cleaned = str(value).strip().replace("\u00a0", "").replace(" ", "")
+    amount = Decimal(cleaned.replace(",", "."))
+    if not amount.is_finite():
+        raise InvalidOperation(value)
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def iter_csv_rows(path, delimiter):
+    # Колонки как у CLI-импорта: date, amount, [kind], [category], [description].
+    # Без kind тип определяется по знаку суммы.
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        if not reader.fieldnames or not {"date", "amount"} <= set(reader.fieldnames):
+            raise CommandError(f"{path}: в CSV нужны колонки date и amount")
+        for row in reader:
+            yield (
+                f"{path}:{reader.line_num}",
+                row["date"],
+                row["amount"],
+                row.get("kind"),
+                row.get("category"),
+                row.get("description"),
+            )
+
+
+def iter_tracker_rows(path, fetch_size):
+    # finance.db консольного трекера (tracker.storage.Storage): старые базы
+    # хранят amount REAL, новые — amount_cents INTEGER.
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        if not columns:
+            raise CommandError(f"{path}: в базе нет таблицы transactions")
+        if "amount_cents" in columns:
+            amount_sql = "amount_cents"
+        else:
+            amount_sql = "CAST(ROUND(amount * 100) AS INTEGER)"
+        cursor = conn.execute(
+            f"""
+            SELECT id, date, {amount_sql}, kind, category, description
+            FROM transactions
+            ORDER BY date, id
+            """
+        )
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row_id, tx_date, cents, kind, category, description in rows:
+                yield (
+                    f"{path}#{row_id}",
+                    tx_date,
+                    Decimal(cents) / 100,
+                    kind,
+                    category,
+                    description,
+                )
+    finally:
+        conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Быстрый импорт транзакций из CSV-выписок или из finance.db "
+        "консольного трекера"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", type=Path)
+        parser.add_argument(
+            "--user",
+            dest="username",
+            required=True,
+            help="Владелец импортируемых транзакций",
+        )
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=["auto", "csv", "tracker"],
+            default="auto",
+            help="csv — выписка, tracker — finance.db консольного трекера",
+        )
+        parser.add_argument(
+            "--default-category",
+            default="Импорт",
+            help="Категория для строк без категории",
+        )
+        parser.add_argument("--delimiter", default=",")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Строк на один bulk_create (по умолчанию {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            self.owner = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']!r} не найден")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size должен быть больше нуля")
+
+        self.default_category = options["default_category"]
+        # одна выборка категорий владельца; новые дописываются в словарь
+        self.categories = {
+            cat.name: cat for cat in Category.objects.filter(owner=self.owner)
+        }
+
+        for path in options["files"]:
+            file_format = options["file_format"]
+            if file_format == "auto":
+                is_db = path.suffix.lower() in (".db", ".sqlite", ".sqlite3")
+                file_format = "tracker" if is_db else "csv"
+            if file_format == "tracker":
+                rows = iter_tracker_rows(path, options["batch_size"])
+            else:
+                rows = iter_csv_rows(path, options["delimiter"])
+
+            started = time.perf_counter()
+            try:
+                count, skipped = self.import_rows(rows, options["batch_size"])
+            except OSError as exc:
+                raise CommandError(f"{path}: {exc}")
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed if elapsed > 0 else 0.0
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{path}: импортировано {count} за {elapsed:.2f} с "
+                    f"({rate:.0f} строк/с)"
+                )
+            )
+            if skipped:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{path}: пропущено строк с нулевой суммой: {skipped}"
+                    )
+                )
+
+        invalidate_totals(self.owner.pk)
+        warning = stale_totals_warning()
+        if warning:
+            self.stdout.write(self.style.WARNING(warning))
+
+    def import_rows(self, rows, batch_size):
+        # Файл целиком — одна транзакция БД; вставка пачками bulk_create.
+        # bulk_create не шлёт сигналы, поэтому помесячные итоги обновляем
+        # сами — одной дельтой на (месяц, категория, тип) в пачке.
+        count = skipped = 0
+        with transaction.atomic():
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if not chunk:
+                    break
+                batch = [tx for tx in map(self.build, chunk) if tx is not None]
+                skipped += len(chunk) - len(batch)
+                Transaction.objects.bulk_create(batch)
+                rollups.apply_changes(
+                    added=[rollups.rollup_values(tx) for tx in batch]
+                )
+                count += len(batch)
+        return count, skipped
+
+    def build(self, row):
+        source, date_str, amount_str, kind, category_name, description = row
+        try:
+            tx_date = date.fromisoformat(str(date_str).strip())
+            amount = _parse_amount(amount_str)
+        except (ValueError, InvalidOperation):
+            raise CommandError(f"{source}: некорректная дата или сумма")
+        if abs(amount) >= MAX_AMOUNT:
+            raise CommandError(f"{source}: сумма {amount} больше допустимой")
+
+        kind = (kind or "").strip()
+        if not kind:
+            kind = "expense" if amount < 0 else "income"
+        if kind not in ("income", "expense"):
+            raise CommandError(f"{source}: неизвестный тип транзакции {kind!r}")
+        amount = abs(amount)
+        if not amount > 0:
+            # веб-форма не допускает нулевых сумм (clean_amount); сюда же
+            # попадают суммы меньше копейки
+            return None
+
+        return Transaction(
+            owner=self.owner,
+            date=tx_date,
+            amount=amount,
+            kind=kind,
+            category=self.category(
+                (category_name or "").strip() or self.default_category, kind
+            ),
+            description=(description or "").strip(),
+        )
+
+    def category(self, name, kind):
+        category = self.categories.get(name)
+        if category is None:
+            category, _ = Category.objects.get_or_create(
+                owner=self.owner,
+                name=name,
+                defaults={"is_income": kind == "income"},
+            )
+            self.categories[name] = category
+        return category
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance import rollups
+from finance.cache import invalidate_totals, stale_totals_warning
+
+
+class Command(BaseCommand):
+    help = "Пересчитать помесячные итоги (MonthlyBalance) из транзакций"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="username",
+            help="Пересчитать только для этого пользователя",
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options["username"]:
+            User = get_user_model()
+            try:
+                owner = User.objects.get(username=options["username"])
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {options['username']!r} не найден")
+
+        created = rollups.rebuild(owner=owner)
+
+        if owner is not None:
+            owner_ids = [owner.pk]
+        else:
+            owner_ids = get_user_model().objects.values_list("pk", flat=True)
+        for owner_id in owner_ids:
+            invalidate_totals(owner_id)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Помесячных итогов пересчитано: {created}")
+        )
+        warning = stale_totals_warning()
+        if warning:
+            self.stdout.write(self.style.WARNING(warning))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_monthlybalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='finance_tx_owner_kind_date',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['owner', 'kind', 'date', 'amount'], name='finance_tx_owner_kind_date_amt'),
+        ),
+    ]
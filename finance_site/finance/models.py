@@ -32,9 +32,11 @@ class Transaction(models.Model):
     date = models.DateField()
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    # RESTRICT, а не PROTECT: категорию с транзакциями всё так же нельзя
+    # удалить, но удаление пользователя удаляет их вместе каскадом
     category = models.ForeignKey(
         Category,
-        on_delete=models.PROTECT,
+        on_delete=models.RESTRICT,
         related_name="transactions",
     )
     description = models.TextField(blank=True)
@@ -42,6 +44,59 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ["-date", "-id"]
+        # Все выборки в views фильтруют по owner, затем по kind и/или
+        # диапазону дат, и сортируют по (-date, -id).
+        # amount — последним полем индекса, а не через include=: так индекс
+        # покрывает суммы и на SQLite (include там не поддерживается, W040).
+        indexes = [
+            models.Index(
+                fields=["owner", "date", "id"],
+                name="finance_tx_owner_date_id",
+            ),
+            models.Index(
+                fields=["owner", "kind", "date", "amount"],
+                name="finance_tx_owner_kind_date_amt",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.date} {self.kind} {self.amount}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # запоминаем значения из БД, чтобы при изменении знать,
+        # из какого месяца/категории/типа вычесть старую сумму
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+class MonthlyBalance(models.Model):
+    # Денормализованные итоги по месяцам; поддерживаются из signals.py,
+    # полностью пересчитываются командой rebuild_monthly_balances.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="monthly_balances",
+    )
+    month = models.DateField()  # первое число месяца
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="monthly_balances",
+    )
+    kind = models.CharField(max_length=7, choices=Transaction.KIND_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("owner", "month", "category", "kind")
+        indexes = [
+            models.Index(
+                fields=["owner", "month", "kind"],
+                name="finance_mb_owner_month_kind",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.kind} {self.category_id} {self.total}"
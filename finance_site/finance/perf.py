@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+# Замеры по запросам: время view целиком, число и время SQL-запросов,
+# время рендера шаблонов. Включается в settings.py (FINANCE_PERF_ENABLED).
+BUFFER_SIZE = getattr(settings, "FINANCE_PERF_BUFFER_SIZE", 500)
+# столько SQL-запросов на страницу уже похоже на N+1
+QUERY_WARNING = getattr(settings, "FINANCE_PERF_QUERY_WARNING", 20)
+
+_current = ContextVar("finance_perf_stats", default=None)
+_lock = threading.Lock()
+_recent = deque(maxlen=BUFFER_SIZE)
+
+
+class RequestStats:
+    __slots__ = ("sql_count", "sql_time", "template_time")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # обёртка для connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "FINANCE_PERF_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        started = time.perf_counter()
+        with self._measure(stats):
+            response = self.get_response(request)
+        view_time = time.perf_counter() - started
+
+        # Server-Timing уходит с заголовками, то есть до тела ответа:
+        # у потокового ответа в нём только работа view до первой строки.
+        sql_desc = f'desc="{stats.sql_count} queries"'
+        response["Server-Timing"] = ", ".join(
+            [
+                f"total;dur={view_time * 1000:.1f}",
+                f"sql;dur={stats.sql_time * 1000:.1f};{sql_desc}",
+                f"template;dur={stats.template_time * 1000:.1f}",
+            ]
+        )
+        if response.streaming and not response.is_async:
+            # Запросы потокового ответа (экспорт CSV) выполняются, пока
+            # сервер читает тело, — уже после выхода из middleware.
+            # Запись добавляется, когда поток прочитан или закрыт.
+            response.streaming_content = self._stream(
+                response.streaming_content, stats, view_time, request, response
+            )
+        else:
+            self._record(request, response, stats, view_time)
+        return response
+
+    @contextmanager
+    def _measure(self, stats):
+        token = _current.set(stats)
+        try:
+            with connection.execute_wrapper(stats):
+                yield
+        finally:
+            _current.reset(token)
+
+    def _stream(self, content, stats, total, request, response):
+        # Время выдачи частей прибавляется к времени view; ожидание,
+        # пока клиент прочитает часть, не считается.
+        chunks = iter(content)
+        try:
+            while True:
+                started = time.perf_counter()
+                with self._measure(stats):
+                    chunk = next(chunks, None)
+                total += time.perf_counter() - started
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # и после полного чтения, и при обрыве (response.close())
+            self._record(request, response, stats, total, streamed=True)
+
+    def _record(self, request, response, stats, total, streamed=False):
+        match = request.resolver_match
+        record = {
+            "at": timezone.now(),
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else "",
+            "status": response.status_code,
+            "streamed": streamed,
+            "total_ms": total * 1000,
+            "sql_count": stats.sql_count,
+            "sql_ms": stats.sql_time * 1000,
+            "template_ms": stats.template_time * 1000,
+        }
+        with _lock:
+            _recent.append(record)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # Обычный бэкенд Django, только render() верхнего шаблона замеряется.
+    # {% include %}/{% extends %} идут внутри него и отдельно не считаются.
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def recent_requests():
+    # последние запросы, новые сверху
+    with _lock:
+        records = list(_recent)
+    records.reverse()
+    return records
+
+
+def summary_by_view(records):
+    groups = defaultdict(list)
+    for record in records:
+        groups[record["view"] or record["path"]].append(record)
+
+    summary = []
+    for view, items in groups.items():
+        count = len(items)
+        summary.append(
+            {
+                "view": view,
+                "requests": count,
+                "avg_ms": sum(r["total_ms"] for r in items) / count,
+                "max_ms": max(r["total_ms"] for r in items),
+                "avg_queries": sum(r["sql_count"] for r in items) / count,
+                "max_queries": max(r["sql_count"] for r in items),
+                "avg_sql_ms": sum(r["sql_ms"] for r in items) / count,
+                "avg_template_ms": sum(r["template_ms"] for r in items) / count,
+            }
+        )
+    summary.sort(key=lambda row: row["avg_ms"] * row["requests"], reverse=True)
+    return summary
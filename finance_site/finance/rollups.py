@@ -0,0 +1,218 @@
+from calendar import monthrange
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlyBalance, Transaction
+
+REBUILD_BATCH_SIZE = 1000
+CENT = Decimal("0.01")
+
+# владельцы, чьи итоги будут пересчитаны целиком (см. deferred):
+# построчные изменения для них пропускаются
+_deferred = ContextVar("finance_rollups_deferred", default=frozenset())
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+def _rollup_key(owner_id, tx_date, category_id, kind):
+    return owner_id, _as_date(tx_date).replace(day=1), category_id, kind
+
+
+def _apply_delta(key, amount, count):
+    owner_id, month, category_id, kind = key
+    rows = MonthlyBalance.objects.filter(
+        owner_id=owner_id, month=month, category_id=category_id, kind=kind
+    )
+    if rows.update(total=F("total") + amount, count=F("count") + count):
+        rows.filter(count__lte=0).delete()
+        return
+    if count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            MonthlyBalance.objects.create(
+                owner_id=owner_id,
+                month=month,
+                category_id=category_id,
+                kind=kind,
+                total=amount,
+                count=count,
+            )
+    except IntegrityError:
+        # строку успел создать параллельный запрос — просто прибавляем
+        rows.update(total=F("total") + amount, count=F("count") + count)
+
+
+def apply_changes(added=(), removed=()):
+    # added/removed — транзакции (или их прежние значения), которые
+    # появились/исчезли. Дельты сначала сворачиваются по ключу, поэтому
+    # пачка из сотни транзакций за месяц даёт один UPDATE.
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for values in added:
+        _add_delta(deltas, values, 1)
+    for values in removed:
+        _add_delta(deltas, values, -1)
+
+    with transaction.atomic():
+        for key, (amount, count) in deltas.items():
+            if amount or count:
+                _apply_delta(key, amount, count)
+
+
+def _add_delta(deltas, values, sign):
+    key = _rollup_key(
+        values["owner_id"], values["date"], values["category_id"], values["kind"]
+    )
+    delta = deltas[key]
+    delta[0] += sign * Decimal(str(values["amount"]))
+    delta[1] += sign
+
+
+def rollup_values(tx):
+    return {
+        "owner_id": tx.owner_id,
+        "date": tx.date,
+        "category_id": tx.category_id,
+        "kind": tx.kind,
+        "amount": tx.amount,
+    }
+
+
+def loaded_rollup_values(tx):
+    # значения, которые сейчас лежат в БД (см. Transaction.from_db)
+    loaded = getattr(tx, "_loaded_values", None)
+    if loaded is None or not all(
+        name in loaded for name in ("owner_id", "date", "category_id", "kind", "amount")
+    ):
+        return None
+    return {name: loaded[name] for name in rollup_values(tx)}
+
+
+def is_deferred(owner_id):
+    return owner_id in _deferred.get()
+
+
+@contextmanager
+def deferred(owner_ids):
+    # Внутри блока сигналы не трогают итоги этих владельцев: вызывающий
+    # код сам пересчитывает их одним rebuild() на владельца.
+    token = _deferred.set(_deferred.get() | frozenset(owner_ids))
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def rebuild(owner=None):
+    # Полный пересчёт из транзакций: одна агрегирующая выборка
+    # и bulk_create пачками.
+    balances = MonthlyBalance.objects.all()
+    transactions = Transaction.objects.all()
+    if owner is not None:
+        balances = balances.filter(owner=owner)
+        transactions = transactions.filter(owner=owner)
+
+    rows = (
+        transactions.annotate(month=TruncMonth("date"))
+        .values("owner_id", "month", "category_id", "kind")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+
+    created = 0
+    with transaction.atomic():
+        balances.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(MonthlyBalance(**row))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                MonthlyBalance.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            MonthlyBalance.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def _next_month(d):
+    return (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _sum_totals(qs, field):
+    return qs.aggregate(
+        total_income=Sum(field, filter=Q(kind="income")),
+        total_expense=Sum(field, filter=Q(kind="expense")),
+    )
+
+
+def _combine(parts):
+    return {
+        name: sum((part[name] or 0 for part in parts), Decimal(0)).quantize(CENT)
+        for name in ("total_income", "total_expense")
+    }
+
+
+def period_totals(owner, kind=None, from_date=None, to_date=None):
+    # Итоги за период: целые месяцы берутся из MonthlyBalance,
+    # и только неполные крайние месяцы — из самих транзакций.
+    # Стоимость — O(месяцев), а не O(транзакций).
+    from_date = _as_date(from_date) if from_date else None
+    to_date = _as_date(to_date) if to_date else None
+
+    raw = Transaction.objects.filter(owner=owner)
+    rollup = MonthlyBalance.objects.filter(owner=owner)
+    if kind:
+        raw = raw.filter(kind=kind)
+        rollup = rollup.filter(kind=kind)
+
+    # [full_from, full_to) — полуинтервал целых месяцев
+    full_from = None
+    if from_date:
+        full_from = from_date if from_date.day == 1 else _next_month(from_date)
+    full_to = None
+    if to_date:
+        last_day = monthrange(to_date.year, to_date.month)[1]
+        if to_date.day == last_day:
+            full_to = _next_month(to_date)
+        else:
+            full_to = to_date.replace(day=1)
+
+    if full_from and full_to and full_from >= full_to:
+        # период внутри одного-двух неполных месяцев
+        qs = raw
+        if from_date:
+            qs = qs.filter(date__gte=from_date)
+        if to_date:
+            qs = qs.filter(date__lte=to_date)
+        return _combine([_sum_totals(qs, "amount")])
+
+    parts = []
+    months = rollup
+    if full_from:
+        months = months.filter(month__gte=full_from)
+    if full_to:
+        months = months.filter(month__lt=full_to)
+    parts.append(_sum_totals(months, "total"))
+
+    if from_date and from_date < full_from:
+        parts.append(
+            _sum_totals(raw.filter(date__gte=from_date, date__lt=full_from), "amount")
+        )
+    if to_date and full_to <= to_date:
+        parts.append(
+            _sum_totals(raw.filter(date__gte=full_to, date__lte=to_date), "amount")
+        )
+
+    return _combine(parts)
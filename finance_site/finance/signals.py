@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import rollups
+from .cache import invalidate_categories, invalidate_totals
+from .models import Category, Transaction
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    removed = []
+    if not created:
+        old = rollups.loaded_rollup_values(instance)
+        if old is None:
+            # объект получен не через ORM-выборку — пересчитываем его
+            # владельца целиком, чтобы не разойтись с таблицей
+            rollups.rebuild(owner=instance.owner)
+            invalidate_totals(instance.owner_id)
+            return
+        removed.append(old)
+    new = rollups.rollup_values(instance)
+    rollups.apply_changes(added=[new], removed=removed)
+    instance._loaded_values = {**getattr(instance, "_loaded_values", {}), **new}
+
+    invalidate_totals(instance.owner_id)
+    if removed and removed[0]["owner_id"] != instance.owner_id:
+        invalidate_totals(removed[0]["owner_id"])
+
+
+def _is_user_deletion(origin):
+    # origin — то, у чего вызвали delete(): объект или QuerySet
+    model = getattr(origin, "model", type(origin))
+    return model is get_user_model()
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, origin=None, **kwargs):
+    # Удаление пользователя: его MonthlyBalance удаляются каскадом вместе
+    # с транзакциями, построчно вычитать нечего. Пачку удаляет
+    # bulk.delete_transactions и пересчитывает итоги один раз.
+    if _is_user_deletion(origin) or rollups.is_deferred(instance.owner_id):
+        return
+    old = rollups.loaded_rollup_values(instance) or rollups.rollup_values(instance)
+    rollups.apply_changes(removed=[old])
+    invalidate_totals(instance.owner_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_categories(instance.owner_id)
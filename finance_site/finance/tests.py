@@ -0,0 +1,418 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import RestrictedError
+from django.test import (
+    TestCase,
+    modify_settings,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import perf, rollups
+from .bulk import delete_transactions
+from .models import Category, MonthlyBalance, Transaction
+
+START = date(2024, 1, 1)
+LIST_URL = reverse("finance:transaction_list")
+BULK_URL = reverse("finance:transaction_bulk")
+
+TABLES = ("finance_transaction", "finance_monthlybalance")
+
+
+def query_plans(queries):
+    # Планы (EXPLAIN QUERY PLAN) выполненных запросов к транзакциям и
+    # итогам по месяцам: проверяются те запросы, что на самом деле
+    # выполнил view, а не их копии в тесте.
+    plans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query["sql"]
+            table = next((name for name in TABLES if f'FROM "{name}"' in sql), None)
+            if not sql.startswith("SELECT") or table is None:
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            plans.append((table, sql, [row[3] for row in cursor.fetchall()]))
+    return plans
+
+
+class TransactionListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner", password="secret")
+        other = User.objects.create_user("other", password="secret")
+        for owner in (cls.user, other):
+            salary = Category.objects.create(
+                owner=owner, name="Зарплата", is_income=True
+            )
+            food = Category.objects.create(owner=owner, name="Еда")
+            Transaction.objects.bulk_create(
+                Transaction(
+                    owner=owner,
+                    date=START + timedelta(days=index % 365),
+                    amount=Decimal(10 + index % 90),
+                    kind="income" if index % 5 == 0 else "expense",
+                    category=salary if index % 5 == 0 else food,
+                )
+                for index in range(1000)
+            )
+        # bulk_create не вызывает сигналы — итоги по месяцам пересчитываем
+        rollups.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_list_query_count(self):
+        # сессия, пользователь, итоги по месяцам + края периода, страница
+        cases = [
+            ({}, 4),
+            ({"kind": "expense"}, 4),
+            ({"from": "2024-02-10", "to": "2024-05-20"}, 6),
+        ]
+        for params, expected in cases:
+            with self.subTest(**params):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = self.client.get(LIST_URL, params)
+                self.assertEqual(response.status_code, 200)
+                # итоги уже в кэше: сессия, пользователь, страница
+                with self.assertNumQueries(3):
+                    self.client.get(LIST_URL, params)
+
+    def test_list_pages_do_not_depend_on_transaction_count(self):
+        response = self.client.get(LIST_URL)
+        cursor = response.context["next_cursor"]
+        self.assertIsNotNone(cursor)
+        with self.assertNumQueries(3):
+            response = self.client.get(LIST_URL, {"after": cursor})
+        self.assertEqual(len(response.context["transactions"]), 50)
+
+    def test_totals_match_transactions(self):
+        totals = rollups.period_totals(
+            self.user, from_date=date(2024, 2, 10), to_date=date(2024, 5, 20)
+        )
+        qs = Transaction.objects.filter(
+            owner=self.user, date__gte=date(2024, 2, 10), date__lte=date(2024, 5, 20)
+        )
+        self.assertEqual(totals, rollups._combine([rollups._sum_totals(qs, "amount")]))
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_list_and_totals_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("планы проверяются в формате SQLite")
+        # (параметры, запросов к транзакциям: страница + края периода)
+        cases = [
+            ({}, 1),
+            ({"kind": "income"}, 1),
+            ({"from": "2024-02-10", "to": "2024-05-20"}, 3),
+            ({"kind": "expense", "from": "2024-02-10", "to": "2024-05-20"}, 3),
+        ]
+        for params, expected in cases:
+            with self.subTest(**params):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(LIST_URL, params)
+                plans = query_plans(queries.captured_queries)
+                tables = [table for table, sql, plan in plans]
+                self.assertEqual(tables.count("finance_transaction"), expected)
+                self.assertEqual(tables.count("finance_monthlybalance"), 1)
+                for table, sql, plan in plans:
+                    # без полного прохода по таблице и без сортировки:
+                    # порядок (-date, -id) и суммы даёт индекс
+                    self.assertTrue(
+                        any(
+                            detail.startswith(f"SEARCH {table} USING")
+                            and "INDEX finance_" in detail
+                            for detail in plan
+                        ),
+                        (sql, plan),
+                    )
+                    for detail in plan:
+                        self.assertNotEqual(detail, f"SCAN {table}", sql)
+                        self.assertNotIn("TEMP B-TREE", detail, sql)
+
+
+@override_settings(FINANCE_PERF_ENABLED=True)
+@modify_settings(MIDDLEWARE={"prepend": "finance.perf.PerformanceMiddleware"})
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner", password="secret")
+        category = Category.objects.create(owner=cls.user, name="Еда")
+        Transaction.objects.bulk_create(
+            Transaction(
+                owner=cls.user,
+                date=START + timedelta(days=index),
+                amount=Decimal(index + 1),
+                kind="expense",
+                category=category,
+            )
+            for index in range(30)
+        )
+
+    def setUp(self):
+        perf._recent.clear()
+        self.client.force_login(self.user)
+
+    def test_streamed_export_counts_queries_while_streaming(self):
+        url = reverse("finance:transaction_export_csv")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            # выборка идёт, пока читается тело ответа
+            self.assertEqual(perf.recent_requests(), [])
+            body = b"".join(response.streaming_content)
+            response.close()
+        self.assertEqual(len(body.splitlines()), 31)
+
+        [record] = perf.recent_requests()
+        self.assertTrue(record["streamed"])
+        self.assertEqual(record["sql_count"], len(queries))
+        self.assertGreater(record["sql_count"], 2)
+
+    def test_regular_response_recorded_at_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(LIST_URL)
+        [record] = perf.recent_requests()
+        self.assertFalse(record["streamed"])
+        self.assertEqual(record["sql_count"], len(queries))
+        self.assertIn("sql;dur=", response["Server-Timing"])
+
+
+def monthly_balances():
+    return sorted(
+        MonthlyBalance.objects.values_list(
+            "owner_id", "month", "category_id", "kind", "total", "count"
+        )
+    )
+
+
+class BulkTransactionTest(TestCase):
+    # bulk_create/bulk_update не шлют сигналы: итоги по месяцам save_forms
+    # ведёт сам, и они должны совпадать с полным пересчётом.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner", password="secret")
+        cls.food = Category.objects.create(owner=cls.user, name="Еда")
+        cls.salary = Category.objects.create(
+            owner=cls.user, name="Зарплата", is_income=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add(self, amount, day=START, category=None):
+        return Transaction.objects.create(
+            owner=self.user,
+            date=day,
+            amount=Decimal(amount),
+            kind="expense",
+            category=category or self.food,
+        )
+
+    def row(self, amount, day=START, **extra):
+        return {
+            "date": day.isoformat(),
+            "amount": amount,
+            "kind": "expense",
+            "category": self.food.pk,
+            **extra,
+        }
+
+    def post(self, rows):
+        response = self.client.post(
+            BULK_URL, json.dumps({"transactions": rows}), "application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertRollupsMatchRebuild(self):
+        maintained = monthly_balances()
+        rollups.rebuild()
+        self.assertEqual(maintained, monthly_balances())
+
+    def test_create_and_update(self):
+        first = self.add("10.00")
+        second = self.add("5.00", START + timedelta(days=40))
+        result = self.post(
+            [
+                self.row("7.50"),
+                self.row("1.25", START + timedelta(days=70), category="Еда"),
+                # перенос в другой месяц и смена категории
+                self.row(
+                    "20.00",
+                    START + timedelta(days=45),
+                    id=first.pk,
+                    category=self.salary.pk,
+                ),
+                self.row("3.00", START + timedelta(days=40), id=str(second.pk)),
+            ]
+        )
+        self.assertEqual(result, {"created": 2, "updated": 2, "errors": []})
+        first.refresh_from_db()
+        self.assertEqual(first.amount, Decimal("20.00"))
+        self.assertRollupsMatchRebuild()
+
+    def test_repeated_id_is_rejected(self):
+        tx = self.add("10.00")
+        result = self.post(
+            [self.row("20.00", id=tx.pk), self.row("30.00", id=str(tx.pk))]
+        )
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(
+            result["errors"],
+            [
+                {
+                    "index": 1,
+                    "errors": {
+                        "id": [
+                            {
+                                "message": "Транзакция уже есть в пакете.",
+                                "code": "invalid",
+                            }
+                        ]
+                    },
+                }
+            ],
+        )
+        tx.refresh_from_db()
+        self.assertEqual(tx.amount, Decimal("20.00"))
+        self.assertEqual(
+            MonthlyBalance.objects.get(owner=self.user).total, Decimal("20.00")
+        )
+        self.assertRollupsMatchRebuild()
+
+    def delete_category_elsewhere(self, category):
+        # как удаление в другом процессе: кэш категорий этого процесса
+        # о нём не знает (сигналы не срабатывают)
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM finance_category WHERE id = %s", [category.pk])
+
+    def test_stale_category_in_json_rows(self):
+        stale = Category.objects.create(owner=self.user, name="Старая")
+        self.client.get(reverse("finance:transaction_bulk_create"))
+        self.delete_category_elsewhere(stale)
+        result = self.post(
+            [self.row("5.00", category=stale.pk), self.row("6.00")]
+        )
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(
+            result["errors"][0]["errors"]["category"][0]["message"],
+            "Неизвестная категория.",
+        )
+        self.assertEqual(result["errors"][0]["index"], 0)
+        self.assertRollupsMatchRebuild()
+
+    def test_stale_category_in_formset_saves_nothing(self):
+        url = reverse("finance:transaction_bulk_create")
+        stale = Category.objects.create(owner=self.user, name="Старая")
+        self.client.get(url)
+        self.delete_category_elsewhere(stale)
+        data = {"form-TOTAL_FORMS": "2", "form-INITIAL_FORMS": "0"}
+        for index, category in enumerate((self.food, stale)):
+            data.update(
+                {
+                    f"form-{index}-date": START.isoformat(),
+                    f"form-{index}-amount": "10.00",
+                    f"form-{index}-kind": "expense",
+                    f"form-{index}-category": str(category.pk),
+                    f"form-{index}-description": "",
+                }
+            )
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        formset = response.context["formset"]
+        self.assertEqual(formset[0].errors, {})
+        self.assertEqual(formset[1].errors["category"], ["Неизвестная категория."])
+        self.assertFalse(Transaction.objects.filter(owner=self.user).exists())
+
+        # после исправления строки сохраняется вся форма
+        data["form-1-category"] = str(self.food.pk)
+        response = self.client.post(url, data)
+        self.assertRedirects(response, LIST_URL)
+        self.assertEqual(Transaction.objects.filter(owner=self.user).count(), 2)
+        self.assertRollupsMatchRebuild()
+
+    def test_invalid_rows_do_not_touch_rollups(self):
+        tx = self.add("10.00")
+        result = self.post(
+            [
+                self.row("5.00", id="abc"),
+                self.row("5.00", id=10**9),
+                self.row("-5.00"),
+                self.row("4.00", id=tx.pk),
+            ]
+        )
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual([error["index"] for error in result["errors"]], [0, 1, 2])
+        self.assertRollupsMatchRebuild()
+
+
+class TransactionDeleteTest(TestCase):
+    # Удаление пачкой и каскадом стоит O(владельцев), а не запрос на строку.
+    ROWS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="secret")
+        cls.other = User.objects.create_user("other", password="secret")
+        for user in (cls.owner, cls.other):
+            category = Category.objects.create(owner=user, name="Еда")
+            for index in range(cls.ROWS if user == cls.owner else 3):
+                Transaction.objects.create(
+                    owner=user,
+                    date=START + timedelta(days=index),
+                    amount=Decimal(index + 1),
+                    kind="expense",
+                    category=category,
+                )
+
+    def assertRollupsMatchRebuild(self):
+        maintained = monthly_balances()
+        rollups.rebuild()
+        self.assertEqual(maintained, monthly_balances())
+
+    def test_single_delete_updates_rollups(self):
+        Transaction.objects.filter(owner=self.owner).first().delete()
+        self.assertRollupsMatchRebuild()
+
+    def test_delete_transactions_rebuilds_once(self):
+        queryset = Transaction.objects.filter(
+            owner=self.owner, date__gte=date(2024, 3, 1)
+        )
+        expected = queryset.count()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(delete_transactions(queryset), expected)
+        self.assertLess(len(queries), 20)
+        self.assertRollupsMatchRebuild()
+        # после блока построчные изменения снова учитываются
+        self.assertFalse(rollups.is_deferred(self.owner.pk))
+        Transaction.objects.filter(owner=self.owner).first().delete()
+        self.assertRollupsMatchRebuild()
+
+    def test_user_delete_skips_per_row_rollups(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.owner.delete()
+        self.assertLess(len(queries), 20)
+        self.assertFalse(
+            MonthlyBalance.objects.filter(owner_id=self.owner.pk).exists()
+        )
+        self.assertEqual(
+            MonthlyBalance.objects.get(owner=self.other).total, Decimal("6.00")
+        )
+        self.assertRollupsMatchRebuild()
+
+    def test_category_with_transactions_is_not_deleted(self):
+        category = Category.objects.get(owner=self.owner)
+        with self.assertRaises(RestrictedError):
+            category.delete()
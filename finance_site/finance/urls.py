@@ -18,10 +18,33 @@ urlpatterns = [
         views.transaction_delete,
         name="transaction_delete",
     ),
+    path("bulk/", views.transaction_bulk, name="transaction_bulk"),
+    path(
+        "bulk/add/",
+        views.transaction_bulk_create,
+        name="transaction_bulk_create",
+    ),
+
+    # экспорт
+    path(
+        "export/transactions.json",
+        views.transaction_export_json,
+        name="transaction_export_json",
+    ),
+    path(
+        "export/transactions.csv",
+        views.transaction_export_csv,
+        name="transaction_export_csv",
+    ),
 
     # категории
     path("categories/", views.category_list, name="category_list"),
     path("categories/add/", views.category_create, name="category_create"),
+    path(
+        "categories/autocomplete/",
+        views.category_autocomplete,
+        name="category_autocomplete",
+    ),
     path(
         "categories/<int:pk>/edit/",
         views.category_edit,
@@ -32,4 +55,7 @@ urlpatterns = [
         views.category_delete,
         name="category_delete",
     ),
+
+    # замеры производительности (только staff)
+    path("perf/", views.perf_report, name="perf_report"),
 ]
@@ -1,44 +1,144 @@
+import csv
+import json
 from datetime import date
+from itertools import islice
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.views.decorators.http import require_POST
+
+from . import perf
+from .bulk import (
+    MAX_BULK_ROWS,
+    BulkTransactionFormSet,
+    OwnerCategories,
+    build_forms,
+    check_categories,
+    save_forms,
+)
+from .cache import get_categories, get_totals
 from .forms import TransactionForm, CategoryForm
 from .models import Transaction, Category
+from .rollups import period_totals
 
 
-@login_required
-def transaction_list(request):
+PAGE_SIZE = 50
+
+
+def _parse_cursor(value):
+    # курсор страницы: "<дата>_<id>" последней/первой показанной транзакции
+    if not value:
+        return None
+    try:
+        date_str, pk = value.split("_", 1)
+        return date.fromisoformat(date_str), int(pk)
+    except ValueError:
+        return None
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _make_cursor(tx_date, pk):
+    return f"{tx_date.isoformat()}_{pk}"
+
+
+def _after_cursor(qs, cursor):
+    # строки строго после курсора в порядке Meta.ordering (-date, -id)
+    return qs.filter(Q(date__lt=cursor[0]) | Q(date=cursor[0], id__lt=cursor[1]))
+
+
+def _filter_transactions(request):
+    # общие фильтры kind/from/to для списка и экспорта
     qs = Transaction.objects.filter(owner=request.user)
 
     kind = request.GET.get("kind")
     if kind in ("income", "expense"):
         qs = qs.filter(kind=kind)
+    else:
+        kind = None
 
-    from_date = request.GET.get("from")
-    to_date = request.GET.get("to")
+    from_date = _parse_date(request.GET.get("from"))
+    to_date = _parse_date(request.GET.get("to"))
     if from_date:
         qs = qs.filter(date__gte=from_date)
     if to_date:
         qs = qs.filter(date__lte=to_date)
 
-    total_income = (
-        qs.filter(kind="income").aggregate(Sum("amount"))["amount__sum"] or 0
-    )
-    total_expense = (
-        qs.filter(kind="expense").aggregate(Sum("amount"))["amount__sum"] or 0
+    return qs, kind, from_date, to_date
+
+
+@login_required
+def transaction_list(request):
+    qs, kind, from_date, to_date = _filter_transactions(request)
+
+    # Итоги: целые месяцы — из MonthlyBalance, края периода — из транзакций.
+    # Результат кэшируется до следующего изменения транзакций (signals.py).
+    totals = get_totals(
+        request.user.pk,
+        kind,
+        from_date,
+        to_date,
+        lambda: period_totals(request.user, kind, from_date, to_date),
     )
+    total_income = totals["total_income"] or 0
+    total_expense = totals["total_expense"] or 0
     balance = total_income - total_expense
 
+    # Постраничный вывод по ключу (date, id) в порядке Meta.ordering:
+    # без OFFSET, поэтому любая страница стоит одинаково.
+    after = _parse_cursor(request.GET.get("after"))
+    before = _parse_cursor(request.GET.get("before"))
+    page_qs = qs.select_related("category")
+    if after:
+        page_qs = _after_cursor(page_qs, after)
+    elif before:
+        page_qs = page_qs.filter(
+            Q(date__gt=before[0]) | Q(date=before[0], id__gt=before[1])
+        ).order_by("date", "id")
+
+    transactions = list(page_qs[: PAGE_SIZE + 1])
+    has_more = len(transactions) > PAGE_SIZE
+    transactions = transactions[:PAGE_SIZE]
+    if before:
+        transactions.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    params = request.GET.copy()
+    params.pop("after", None)
+    params.pop("before", None)
+
     return render(
         request,
         "finance/transaction_list.html",
         {
-            "transactions": qs.select_related("category"),
+            "transactions": transactions,
             "total_income": total_income,
             "total_expense": total_expense,
             "balance": balance,
+            "base_query": params.urlencode(),
+            "next_cursor": (
+                _make_cursor(transactions[-1].date, transactions[-1].pk)
+                if has_next and transactions
+                else None
+            ),
+            "prev_cursor": (
+                _make_cursor(transactions[0].date, transactions[0].pk)
+                if has_prev and transactions
+                else None
+            ),
         },
     )
 
@@ -112,14 +212,144 @@ def transaction_delete(request, pk: int):
     )
 
 
+# ---------- Пакетный ввод ----------
+
+
+@login_required
+@require_POST
+def transaction_bulk(request):
+    # JSON: {"transactions": [{...}, ...]}; строки с "id" изменяются.
+    # Валидные строки сохраняются, ошибки возвращаются по номеру строки.
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Некорректный JSON."}, status=400)
+    rows = payload.get("transactions") if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        return JsonResponse({"error": "Ожидался список transactions."}, status=400)
+    if len(rows) > MAX_BULK_ROWS:
+        return JsonResponse(
+            {"error": f"Не больше {MAX_BULK_ROWS} строк за запрос."}, status=400
+        )
+
+    valid_forms, errors = build_forms(request.user, rows)
+    created, updated = save_forms(request.user, valid_forms)
+    return JsonResponse({"created": created, "updated": updated, "errors": errors})
+
+
+@login_required
+def transaction_bulk_create(request):
+    categories = OwnerCategories(request.user)
+    formset = BulkTransactionFormSet(
+        request.POST or None,
+        form_kwargs={"categories": categories},
+    )
+    if request.method == "POST" and formset.is_valid():
+        changed = [
+            (index, form) for index, form in enumerate(formset) if form.has_changed()
+        ]
+        valid, stale = check_categories(request.user, changed)
+        # Форма сохраняется целиком или никак: после частичного сохранения
+        # повторная отправка той же формы задвоила бы сохранённые строки.
+        if not stale:
+            save_forms(request.user, valid)
+            return redirect("finance:transaction_list")
+        for error in stale:
+            formset[error["index"]].add_error("category", "Неизвестная категория.")
+
+    return render(
+        request,
+        "finance/transaction_bulk_form.html",
+        {
+            "formset": formset,
+            "title": "Пакетный ввод транзакций",
+        },
+    )
+
+
+# ---------- Экспорт ----------
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ["id", "date", "kind", "category", "amount", "description"]
+
+
+def _export_rows(request):
+    # Кортежи через values_list().iterator(): без объектов моделей и без
+    # загрузки всей выборки в память. after/limit — постраничная выгрузка.
+    qs, _, _, _ = _filter_transactions(request)
+    after = _parse_cursor(request.GET.get("after"))
+    if after:
+        qs = _after_cursor(qs, after)
+
+    rows = qs.values_list(
+        "id", "date", "kind", "category__name", "amount", "description"
+    )
+    try:
+        limit = int(request.GET.get("limit", ""))
+    except ValueError:
+        limit = None
+    if limit is not None and limit > 0:
+        # на одну строку больше, чтобы понять, есть ли следующая страница
+        rows = rows[: limit + 1]
+    else:
+        limit = None
+    return rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), limit
+
+
+class _Echo:
+    # «файл» для csv.writer, который просто возвращает записанную строку
+    def write(self, value):
+        return value
+
+
+@login_required
+def transaction_export_json(request):
+    rows, limit = _export_rows(request)
+
+    def stream():
+        yield '{"results": ['
+        last = None
+        next_cursor = None
+        for i, row in enumerate(rows):
+            if i == limit:
+                next_cursor = _make_cursor(last[1], last[0])
+                break
+            item = dict(zip(EXPORT_FIELDS, row))
+            item["date"] = row[1].isoformat()
+            item["amount"] = str(row[4])
+            yield ("," if last else "") + json.dumps(item, ensure_ascii=False)
+            last = row
+        yield '], "next": ' + json.dumps(next_cursor) + "}"
+
+    return StreamingHttpResponse(stream(), content_type="application/json")
+
+
+@login_required
+def transaction_export_csv(request):
+    # Курсор следующей страницы для CSV — "<date>_<id>" последней строки.
+    rows, limit = _export_rows(request)
+    if limit is not None:
+        rows = islice(rows, limit)
+    writer = csv.writer(_Echo())
+
+    def stream():
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = 'attachment; filename="transactions.csv"'
+    return response
+
+
 # ---------- Категории ----------
 
 
 @login_required
 def category_list(request):
-    categories = Category.objects.filter(owner=request.user).order_by(
-        "is_income", "name"
-    )
+    # кэш уже отсортирован по имени; сортировка устойчивая
+    categories = sorted(get_categories(request.user.pk), key=lambda c: c.is_income)
     return render(
         request,
         "finance/category_list.html",
@@ -189,3 +419,43 @@ def category_delete(request, pk: int):
             "category": cat,
         },
     )
+
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+@login_required
+def category_autocomplete(request):
+    # ?q=подстрока — категории из кэша владельца; сначала совпадения
+    # с начала имени, затем остальные, в каждой группе по алфавиту.
+    query = request.GET.get("q", "").strip().casefold()
+    matches = [
+        cat for cat in get_categories(request.user.pk) if query in cat.name.casefold()
+    ]
+    matches.sort(key=lambda cat: not cat.name.casefold().startswith(query))
+    return JsonResponse(
+        {
+            "results": [
+                {"id": cat.id, "name": cat.name, "is_income": cat.is_income}
+                for cat in matches[:AUTOCOMPLETE_LIMIT]
+            ]
+        }
+    )
+
+
+# ---------- Производительность ----------
+
+
+@staff_member_required
+def perf_report(request):
+    records = perf.recent_requests()
+    return render(
+        request,
+        "finance/perf_report.html",
+        {
+            "enabled": getattr(settings, "FINANCE_PERF_ENABLED", False),
+            "summary": perf.summary_by_view(records),
+            "records": records,
+            "query_warning": perf.QUERY_WARNING,
+        },
+    )
@@ -62,6 +62,16 @@ TEMPLATES = [
     },
 ]
 
+# Замеры производительности: заголовки Server-Timing (время view, SQL,
+# шаблонов) и отчёт по последним запросам на /perf/ (только staff).
+# Включается переменной окружения FINANCE_PERF=1.
+FINANCE_PERF_ENABLED = os.environ.get("FINANCE_PERF") == "1"
+FINANCE_PERF_BUFFER_SIZE = 500
+FINANCE_PERF_QUERY_WARNING = 20
+if FINANCE_PERF_ENABLED:
+    MIDDLEWARE.insert(0, "finance.perf.PerformanceMiddleware")
+    TEMPLATES[0]["BACKEND"] = "finance.perf.TimedDjangoTemplates"
+
 WSGI_APPLICATION = "finance_site.wsgi.application"
 
 
@@ -88,6 +98,33 @@ DATABASES = {
 }
 """
 
+# Кэш. По умолчанию — в памяти процесса (у каждого воркера свой).
+# Чтобы кэш был общим для нескольких воркеров, подключи Redis/Memcached.
+# С кэшем в памяти сброс итогов из manage.py (import_transactions,
+# rebuild_monthly_balances) веб-воркерам не виден: они обновятся через
+# FINANCE_TOTALS_CACHE_TIMEOUT.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "finance-tracker",
+    }
+}
+
+# Вариант с Redis (закомментировано):
+"""
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379",
+    }
+}
+"""
+
+# Сколько секунд хранить итоги доходов/расходов для страницы транзакций
+FINANCE_TOTALS_CACHE_TIMEOUT = 300
+# Список категорий пользователя (сбрасывается при изменении категорий)
+FINANCE_CATEGORIES_CACHE_TIMEOUT = 3600
+
 # Пароли (оставь по умолчанию)
 AUTH_PASSWORD_VALIDATORS = [
     {
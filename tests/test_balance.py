@@ -0,0 +1,176 @@
+import io
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from tracker.balance import BalanceIndex, FenwickTree
+from tracker.cli import create_parser, run_script
+from tracker.models import Transaction
+from tracker.partitions import PartitionedStorage
+from tracker.storage import Storage
+
+START = date(2024, 1, 1)
+
+
+def make_transaction(day, amount, kind="expense"):
+    return Transaction(
+        id=None,
+        date=day,
+        amount=amount,
+        kind=kind,
+        category="еда",
+        description="",
+        created_at=datetime(2024, 1, 1),
+    )
+
+
+class FenwickTreeTest(unittest.TestCase):
+    def test_prefix_sums_match_naive(self):
+        rng = random.Random(1)
+        values = [rng.randint(-100, 100) for _ in range(200)]
+        tree = FenwickTree(values)
+        for _ in range(500):
+            index = rng.randrange(len(values))
+            delta = rng.randint(-100, 100)
+            values[index] += delta
+            tree.add(index, delta)
+            probe = rng.randrange(len(values))
+            self.assertEqual(tree.prefix_sum(probe), sum(values[: probe + 1]))
+
+
+class BalanceIndexTest(unittest.TestCase):
+    def test_grows_in_both_directions(self):
+        index = BalanceIndex()
+        self.assertEqual(index.balance_at(100), 0)
+        index.add(100, 5)
+        index.add(90, -2)
+        index.add(400, 7)
+        self.assertEqual(index.balance_at(89), 0)
+        self.assertEqual(index.balance_at(95), -2)
+        self.assertEqual(index.balance_at(100), 3)
+        self.assertEqual(index.balance_at(399), 3)
+        self.assertEqual(index.balance_at(10**6), 10)
+
+
+class StorageBalanceIndexTest(unittest.TestCase):
+    # Индекс в памяти и запрос к daily_balance должны давать один баланс.
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "finance.db"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sql_balance_at(self, day):
+        with Storage(self.path) as storage:
+            return storage.balance_at(day)
+
+    def test_back_dated_inserts_agree_with_sql(self):
+        rng = random.Random(2)
+
+        def random_transaction(first, last):
+            return make_transaction(
+                START + timedelta(days=rng.randrange(first, last)),
+                round(rng.uniform(1, 500), 2),
+                rng.choice(("income", "expense")),
+            )
+
+        added = [random_transaction(0, 365) for _ in range(300)]
+        probes = [START + timedelta(days=offset) for offset in range(-40, 420, 7)]
+        with Storage(self.path) as storage:
+            storage.add_transactions(added)
+            index = storage.balance_index()
+            for step in range(100):
+                # вставки и в прошлое, и раньше самого раннего дня
+                tx = random_transaction(-30, 400)
+                batch = [tx, tx] if step % 10 == 0 else [tx]
+                if len(batch) > 1:
+                    storage.add_transactions(batch)
+                else:
+                    storage.add_transaction(tx)
+                added.extend(batch)
+            # индекс обновлялся вставками, а не строился заново
+            self.assertIs(storage.balance_index(), index)
+            by_index = [storage.balance_at(day) for day in probes]
+
+        self.assertEqual(by_index, [self.sql_balance_at(day) for day in probes])
+        expected = [
+            round(
+                sum(
+                    tx.amount if tx.kind == "income" else -tx.amount
+                    for tx in added
+                    if tx.date <= day
+                ),
+                2,
+            )
+            for day in probes
+        ]
+        self.assertEqual(by_index, expected)
+
+    def test_rebuilt_after_write_from_another_connection(self):
+        with Storage(self.path) as storage:
+            storage.add_transaction(make_transaction(START, 100.0, "income"))
+            storage.balance_index()
+            with Storage(self.path) as other:
+                other.add_transaction(make_transaction(START, 30.0))
+            self.assertEqual(storage.balance_at(START), 70.0)
+
+    def test_rolled_back_command_is_not_counted(self):
+        with Storage(self.path) as storage:
+            storage.balance_index()
+            with storage.grouped_commits():
+                storage.add_transaction(make_transaction(START, 100.0, "income"))
+                with self.assertRaises(ValueError):
+                    with storage.savepoint():
+                        storage.add_transaction(make_transaction(START, 40.0))
+                        raise ValueError
+                self.assertEqual(storage.balance_at(START), 100.0)
+            self.assertEqual(storage.balance_at(START), self.sql_balance_at(START))
+
+    def test_script_uses_index(self):
+        lines = [
+            "add income 100 зарплата --date 2024-03-01",
+            "balance --at 2024-03-31",
+            "add expense 30 еда --date 2024-02-15",
+            "balance --at 2024-02-20",
+            "balance --at 2024-03-31",
+        ]
+        with Storage(self.path) as storage:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                exit_code = run_script(create_parser(), lines, storage, 1, True)
+            self.assertEqual(exit_code, 0)
+            self.assertIsNotNone(storage._balance_index)
+        balances = [
+            line.rsplit(" ", 1)[1]
+            for line in output.getvalue().splitlines()
+            if line.startswith("Баланс")
+        ]
+        self.assertEqual(balances, ["100.00", "-30.00", "70.00"])
+        self.assertEqual(self.sql_balance_at(date(2024, 3, 31)), 70.0)
+
+    def test_partitioned_script_sees_uncommitted_rows(self):
+        # summary по нескольким годам внутри одной группы записи: пул
+        # процессов этих строк ещё не видит, поэтому считается в процессе
+        lines = [
+            "add income 100 a --date 2023-05-01",
+            "add income 50 a --date 2024-05-01",
+            "summary",
+            "balance --at 2024-12-31",
+        ]
+        directory = Path(self.directory.name) / "partitions"
+        with PartitionedStorage(directory, workers=2) as storage:
+            output = io.StringIO()
+            with redirect_stdout(output):
+                exit_code = run_script(create_parser(), lines, storage, 100, True)
+        self.assertEqual(exit_code, 0)
+        printed = output.getvalue()
+        self.assertIn(f"Доходы : {150:10.2f}", printed)
+        self.assertIn("Баланс на 2024-12-31: 150.00", printed)
+
+
+if __name__ == "__main__":
+    unittest.main()
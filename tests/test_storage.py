@@ -0,0 +1,225 @@
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+from tracker.models import Transaction
+from tracker.partitions import PartitionedStorage
+from tracker.storage import MIGRATIONS, Storage
+
+FROM_DATE = date(2024, 2, 1)
+TO_DATE = date(2024, 4, 30)
+CATEGORIES = ("еда", "жильё", "зарплата", "транспорт")
+
+
+def make_transactions(count):
+    for index in range(count):
+        kind = "income" if index % 5 == 0 else "expense"
+        yield Transaction(
+            id=None,
+            date=date(2024, 1 + index % 12, 1 + index % 28),
+            amount=round(10 + index * 0.37, 2),
+            kind=kind,
+            category=CATEGORIES[index % len(CATEGORIES)],
+            description=f"операция {index}",
+            created_at=datetime(2024, 1, 1),
+        )
+
+
+def query_plans(storage, run):
+    # Планы (EXPLAIN QUERY PLAN) всех SELECT, которые выполнил run():
+    # проверяются настоящие запросы Storage, а не их копии в тесте.
+    conn = storage._connect()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        run()
+    finally:
+        conn.set_trace_callback(None)
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith("SELECT"):
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+            plans.append([row[3] for row in rows])
+    return plans
+
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = Storage(Path(":memory:"))
+        self.storage.add_transactions(make_transactions(2000))
+        self.storage._connect().execute("ANALYZE")
+
+    def tearDown(self):
+        self.storage.close()
+
+    def assertIndexed(self, run):
+        # Ни полного прохода по таблице transactions, ни сортировки для
+        # ORDER BY — порядок (date, id) даёт индекс.
+        plans = query_plans(self.storage, run)
+        self.assertTrue(plans)
+        for plan in plans:
+            for detail in plan:
+                self.assertNotEqual(detail, "SCAN transactions", plan)
+                self.assertNotIn("TEMP B-TREE FOR ORDER BY", detail, plan)
+        return plans
+
+    def test_list_uses_indexes_without_sort(self):
+        cases = [
+            {},
+            {"from_date": FROM_DATE, "to_date": TO_DATE},
+            {"category": "еда"},
+            {"category": "еда", "from_date": FROM_DATE},
+            {"after_id": 100, "limit": 50},
+        ]
+        for kwargs in cases:
+            with self.subTest(**kwargs):
+                plans = self.assertIndexed(
+                    lambda: list(self.storage.iter_transactions(**kwargs))
+                )
+                for detail in plans[0]:
+                    self.assertNotIn("TEMP B-TREE", detail)
+
+    def test_filtered_list_is_a_range_search(self):
+        plans = self.assertIndexed(
+            lambda: list(
+                self.storage.iter_transactions(from_date=FROM_DATE, to_date=TO_DATE)
+            )
+        )
+        self.assertIn("SEARCH transactions USING INDEX", plans[0][0])
+
+    def test_summary_reads_indexes(self):
+        # GROUP BY kind, category сортирует уже агрегированные строки
+        # (не больше, чем пар тип/категория), поэтому TEMP B-TREE FOR
+        # GROUP BY допустим; таблица transactions целиком не читается.
+        plans = self.assertIndexed(
+            lambda: self.storage.summarize(from_date=FROM_DATE, to_date=TO_DATE)
+        )
+        self.assertIn("SEARCH daily_totals USING PRIMARY KEY", plans[0][0])
+
+        plans = self.assertIndexed(
+            lambda: self.storage.summarize(
+                from_date=FROM_DATE, to_date=TO_DATE, use_rollup=False
+            )
+        )
+        self.assertIn("USING COVERING INDEX", plans[0][0])
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "finance.db"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_v1_database(self, transactions):
+        # база первой версии: amount REAL, без индексов и итогов
+        conn = sqlite3.connect(self.path)
+        conn.executescript(MIGRATIONS[0])
+        conn.executemany(
+            """
+            INSERT INTO transactions
+                (date, amount, kind, category, description, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    tx.date.isoformat(),
+                    tx.amount,
+                    tx.kind,
+                    tx.category,
+                    tx.description,
+                    tx.created_at.isoformat(),
+                )
+                for tx in transactions
+            ],
+        )
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+
+    def test_upgrade_v1_in_place(self):
+        transactions = list(make_transactions(300))
+        self.create_v1_database(transactions)
+
+        with Storage(self.path) as storage:
+            conn = storage._connect()
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            self.assertEqual(version, len(MIGRATIONS))
+            indexes = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index'"
+                )
+            }
+            self.assertIn("idx_transactions_date_id", indexes)
+            self.assertIn("idx_transactions_category_date", indexes)
+
+            stored = storage.list_transactions()
+            self.assertEqual(len(stored), len(transactions))
+            self.assertEqual(
+                sorted((tx.date, tx.amount, tx.category) for tx in stored),
+                sorted((tx.date, tx.amount, tx.category) for tx in transactions),
+            )
+
+            expected = round(
+                sum(
+                    tx.amount if tx.kind == "income" else -tx.amount
+                    for tx in transactions
+                ),
+                2,
+            )
+            self.assertEqual(storage.summarize()["balance"], expected)
+            self.assertEqual(storage.balance_at(date(2025, 1, 1)), expected)
+            self.assertEqual(len(list(storage.search_transactions("операция"))), 300)
+
+        # повторное открытие ничего не мигрирует и данные не трогает
+        with Storage(self.path) as storage:
+            self.assertEqual(len(storage.list_transactions()), len(transactions))
+
+    def test_new_database_has_latest_schema(self):
+        with Storage(self.path) as storage:
+            version = storage._connect().execute("PRAGMA user_version").fetchone()[0]
+        self.assertEqual(version, len(MIGRATIONS))
+
+
+class PartitionedWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_bulk_insert_begins_immediate(self):
+        transactions = list(make_transactions(20))
+        with PartitionedStorage(self.path) as storage:
+            storage.add_transaction(transactions[0])
+            conn = storage.partition(2024)._connect()
+            statements = []
+            conn.set_trace_callback(statements.append)
+            self.assertEqual(storage.add_transactions(transactions), 20)
+            conn.set_trace_callback(None)
+        self.assertEqual(statements[0], "BEGIN IMMEDIATE")
+
+    def test_bulk_insert_retries_when_locked(self):
+        transactions = list(make_transactions(5))
+        options = dict(busy_timeout=0.01, write_retries=2)
+        with PartitionedStorage(self.path, **options) as storage:
+            storage.add_transaction(transactions[0])
+            other = sqlite3.connect(storage.partition_path(2024))
+            other.execute("BEGIN IMMEDIATE")
+            try:
+                with self.assertRaises(sqlite3.OperationalError):
+                    storage.add_transactions(transactions)
+            finally:
+                other.rollback()
+                other.close()
+            self.assertEqual(storage.partition(2024).busy_retries, 2)
+            self.assertEqual(len(storage.list_transactions()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from array import array
+from typing import Iterable, Tuple
+
+
+class FenwickTree:
+    # Дерево Фенвика (binary indexed tree) над массивом целых:
+    # прибавление к элементу и сумма префикса — за O(log n).
+    __slots__ = ("_tree",)
+
+    def __init__(self, values: Iterable[int]) -> None:
+        # построение за O(n): каждый узел отдаёт свою сумму родителю
+        tree = array("q", [0])
+        tree.extend(values)
+        size = len(tree) - 1
+        for index in range(1, size + 1):
+            parent = index + (index & -index)
+            if parent <= size:
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def add(self, index: int, delta: int) -> None:
+        tree = self._tree
+        size = len(tree) - 1
+        index += 1
+        while index <= size:
+            tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        # сумма элементов [0, index]
+        tree = self._tree
+        total = 0
+        index += 1
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+
+class BalanceIndex:
+    # Баланс на дату в памяти: дерево Фенвика по дням (ordinal) с дневным
+    # сальдо в копейках. Вставки задним числом обходятся в O(log n) вместо
+    # пересчёта всех последующих дней. Диапазон дней растёт удвоением.
+    __slots__ = ("first_day", "_nets", "_tree")
+
+    def __init__(self, days: Iterable[Tuple[int, int]] = ()) -> None:
+        # days — пары (ordinal дня, сальдо за день), отсортированные по дню
+        days = list(days)
+        self.first_day = days[0][0] if days else 0
+        size = days[-1][0] - self.first_day + 1 if days else 0
+        self._nets = array("q", bytes(8 * size))
+        for day, net in days:
+            self._nets[day - self.first_day] += net
+        self._tree = FenwickTree(self._nets)
+
+    def add(self, day: int, delta: int) -> None:
+        if not self._nets:
+            self.first_day = day
+        if day < self.first_day:
+            # новый самый ранний день — сдвигаем начало и перестраиваем
+            shift = self.first_day - day
+            self._nets = array("q", bytes(8 * shift)) + self._nets
+            self.first_day = day
+            self._tree = FenwickTree(self._nets)
+        position = day - self.first_day
+        if position >= len(self._nets):
+            grow = max(position + 1, 2 * len(self._nets)) - len(self._nets)
+            self._nets.extend(array("q", bytes(8 * grow)))
+            self._tree = FenwickTree(self._nets)
+        self._nets[position] += delta
+        self._tree.add(position, delta)
+
+    def balance_at(self, day: int) -> int:
+        # баланс на конец дня day в копейках
+        if not self._nets or day < self.first_day:
+            return 0
+        position = min(day - self.first_day, len(self._nets) - 1)
+        return self._tree.prefix_sum(position)
@@ -1,11 +1,45 @@
 import argparse
+import shlex
+import sqlite3
+import sys
+import time
 from pathlib import Path
 from datetime import date, datetime
-from typing import Optional, List
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, List, Tuple, Union
 
 from .models import Transaction
-from .storage import Storage
-from .reports import compute_summary, print_summary
+from .storage import (
+    DEFAULT_CHUNK_SIZE,
+    JOURNAL_MODES,
+    SEARCH_ORDERS,
+    SYNCHRONOUS_MODES,
+    Storage,
+)
+from .importers import DEFAULT_CATEGORY, iter_file_transactions
+from .profiling import Timings, stage
+from .reports import (
+    ENGINES,
+    HAS_NUMPY,
+    PERIODS,
+    print_series,
+    print_summary,
+)
+
+if TYPE_CHECKING:
+    from .partitions import PartitionedStorage
+    from .spool import Spool
+
+
+DEFAULT_SEARCH_LIMIT = 50
+# пакетный режим: команд на один COMMIT (интерактивный shell — каждая)
+DEFAULT_COMMIT_EVERY = 500
+SHELL_PROMPT = "finance> "
+SHELL_EXIT = ("exit", "quit")
+# --concurrent: ожидание блокировки и повторы BEGIN IMMEDIATE
+CONCURRENT_BUSY_TIMEOUT_MS = 30_000
+CONCURRENT_WRITE_RETRIES = 5
+# команды, которые с --spool пишут в очередь, а не в базу
+SPOOL_COMMANDS = ("add", "import")
 
 
 def parse_date_or_today(date_str: Optional[str]) -> date:
@@ -20,14 +54,14 @@ def parse_date_or_none(date_str: Optional[str]) -> Optional[date]:
     return date.fromisoformat(date_str)
 
 
-def print_transactions(transactions: List[Transaction]) -> None:
-    if not transactions:
-        print("Транзакций не найдено.")
-        return
-
-    print("ID  | Дата       | Тип     | Категория       | Сумма      | Комментарий")
-    print("-" * 80)
+def print_transactions(transactions: Iterable[Transaction]) -> None:
+    # Печатаем по мере чтения, не дожидаясь загрузки всего списка.
+    printed = False
     for tx in transactions:
+        if not printed:
+            print("ID  | Дата       | Тип     | Категория       | Сумма      | Комментарий")
+            print("-" * 80)
+            printed = True
         kind_label = "Доход" if tx.kind == "income" else "Расход"
         print(
             f"{tx.id:>3} | {tx.date.isoformat()} | "
@@ -35,6 +69,22 @@ def print_transactions(transactions: List[Transaction]) -> None:
             f"{tx.amount:10.2f} | {tx.description}"
         )
 
+    if not printed:
+        print("Транзакций не найдено.")
+
+
+def print_balance_series(series: Iterable[Tuple[date, float, float]]) -> None:
+    printed = False
+    for day, net, balance in series:
+        if not printed:
+            print("Дата       | За день    | Баланс")
+            print("-" * 38)
+            printed = True
+        print(f"{day.isoformat()} | {net:10.2f} | {balance:10.2f}")
+
+    if not printed:
+        print("Транзакций не найдено.")
+
 
 def create_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
@@ -47,8 +97,109 @@ def create_parser() -> argparse.ArgumentParser:
         default=Path("finance.db"),
         help="Путь к файлу базы данных (по умолчанию ./finance.db)",
     )
+    parser.add_argument(
+        "--db-journal-mode",
+        dest="db_journal_mode",
+        choices=JOURNAL_MODES,
+        help="PRAGMA journal_mode (например, wal для массовой записи)",
+    )
+    parser.add_argument(
+        "--db-synchronous",
+        dest="db_synchronous",
+        choices=SYNCHRONOUS_MODES,
+        help="PRAGMA synchronous (normal — быстрее, но менее надёжно, чем full)",
+    )
+    parser.add_argument(
+        "--db-cache-size",
+        dest="db_cache_size",
+        type=int,
+        metavar="KIB",
+        help="Размер кэша страниц SQLite в KiB",
+    )
+    parser.add_argument(
+        "--db-mmap-size",
+        dest="db_mmap_size",
+        type=int,
+        metavar="MIB",
+        help="Размер memory-mapped I/O в MiB (0 — отключить)",
+    )
+    parser.add_argument(
+        "--db-busy-timeout",
+        dest="db_busy_timeout",
+        type=int,
+        metavar="MS",
+        help="Сколько ждать, пока другой процесс освободит базу (по умолчанию 5000)",
+    )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help=(
+            "Режим для нескольких процессов-писателей: WAL, ожидание блокировки "
+            f"до {CONCURRENT_BUSY_TIMEOUT_MS // 1000} с и повтор записи "
+            "со случайной задержкой"
+        ),
+    )
+    parser.add_argument(
+        "--spool",
+        dest="spool_dir",
+        type=Path,
+        metavar="DIR",
+        help=(
+            "add и import пишут в очередь DIR, не открывая базу; "
+            "перенос в базу — командой flush"
+        ),
+    )
+    parser.add_argument(
+        "--partitions",
+        dest="partitions_dir",
+        type=Path,
+        metavar="DIR",
+        help=(
+            "Хранить транзакции по годам: DIR/finance-YYYY.db "
+            "(вместо одного файла --db)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        help="Процессов для сводки по годовым разделам (по умолчанию — число ядер)",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Вывести в stderr время по этапам: разбор аргументов, подключение, "
+        "запрос, преобразование строк, расчёт, печать",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile_path",
+        type=Path,
+        metavar="FILE",
+        help="Сохранить профиль cProfile в FILE (смотреть: python -m pstats FILE)",
+    )
+    parser.add_argument(
+        "--batch",
+        dest="batch_path",
+        metavar="FILE",
+        help=(
+            "Выполнить команды из FILE ('-' — из stdin), по одной на строку, "
+            "в одном процессе; остановиться на первой ошибке"
+        ),
+    )
+    parser.add_argument(
+        "--commit-every",
+        dest="commit_every",
+        type=int,
+        metavar="N",
+        help=(
+            "Для --batch и shell: фиксировать изменения раз в N команд "
+            f"(по умолчанию {DEFAULT_COMMIT_EVERY}, в интерактивном shell — 1)"
+        ),
+    )
 
-    subparsers = parser.add_subparsers(dest="command", required=True)
+    # команда не нужна только с --batch — проверяется в main
+    subparsers = parser.add_subparsers(dest="command")
 
     # add
     add_parser = subparsers.add_parser(
@@ -101,6 +252,70 @@ def create_parser() -> argparse.ArgumentParser:
         dest="category",
         help="Фильтр по категории",
     )
+    list_parser.add_argument(
+        "--limit",
+        dest="limit",
+        type=int,
+        help="Показать не больше N транзакций",
+    )
+    list_parser.add_argument(
+        "--offset",
+        dest="offset",
+        type=int,
+        default=0,
+        help="Пропустить первые N транзакций",
+    )
+    list_parser.add_argument(
+        "--after-id",
+        dest="after_id",
+        type=int,
+        help="Показать транзакции после транзакции с этим ID (постраничный вывод)",
+    )
+
+    # search
+    search_parser = subparsers.add_parser(
+        "search", help="Найти транзакции по словам из комментария и категории"
+    )
+    search_parser.add_argument(
+        "query",
+        nargs="+",
+        help="Слова для поиска (ищутся по началу слова, все обязательны)",
+    )
+    search_parser.add_argument(
+        "--from",
+        dest="from_date",
+        help="Дата начала периода YYYY-MM-DD",
+    )
+    search_parser.add_argument(
+        "--to",
+        dest="to_date",
+        help="Дата конца периода YYYY-MM-DD",
+    )
+    search_parser.add_argument(
+        "--limit",
+        dest="limit",
+        type=int,
+        default=DEFAULT_SEARCH_LIMIT,
+        help=(
+            "Показать не больше N самых подходящих "
+            f"(по умолчанию {DEFAULT_SEARCH_LIMIT}, 0 — все)"
+        ),
+    )
+    search_parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Передать запрос в синтаксисе FTS5 как есть (OR, NOT, NEAR, ...)",
+    )
+    search_parser.add_argument(
+        "--sort",
+        dest="order",
+        choices=SEARCH_ORDERS,
+        default="rank",
+        help=(
+            "rank — по релевантности (по умолчанию), recent — сначала новые; "
+            "recent быстрее, если слово встречается в очень многих транзакциях"
+        ),
+    )
 
     # summary
     summary_parser = subparsers.add_parser(
@@ -117,15 +332,351 @@ def create_parser() -> argparse.ArgumentParser:
         help="Дата конца периода YYYY-MM-DD",
     )
 
+    summary_parser.add_argument(
+        "--engine",
+        dest="engine",
+        choices=("sql",) + ENGINES,
+        default="sql",
+        help=(
+            "Где считать сводку: sql — агрегация в SQLite (по умолчанию), "
+            "python/numpy — в памяти по колоночной выборке"
+        ),
+    )
+    summary_parser.add_argument(
+        "--period",
+        dest="period",
+        choices=PERIODS,
+        help="Дополнительно показать доходы и расходы по месяцам или неделям",
+    )
+
+    # balance
+    balance_parser = subparsers.add_parser(
+        "balance", help="Показать баланс на дату или по дням"
+    )
+    balance_parser.add_argument(
+        "--at",
+        dest="at_date",
+        help="Баланс на конец дня YYYY-MM-DD (по умолчанию сегодня)",
+    )
+    balance_parser.add_argument(
+        "--series",
+        action="store_true",
+        help="Показать баланс на конец каждого дня с транзакциями",
+    )
+    balance_parser.add_argument(
+        "--from",
+        dest="from_date",
+        help="Начало периода для --series YYYY-MM-DD",
+    )
+    balance_parser.add_argument(
+        "--to",
+        dest="to_date",
+        help="Конец периода для --series YYYY-MM-DD",
+    )
+
+    # import
+    import_parser = subparsers.add_parser(
+        "import", help="Импортировать транзакции из CSV или OFX"
+    )
+    import_parser.add_argument(
+        "file",
+        type=Path,
+        help="Файл выписки (CSV или OFX)",
+    )
+    import_parser.add_argument(
+        "--format",
+        dest="file_format",
+        choices=["auto", "csv", "ofx"],
+        default="auto",
+        help="Формат файла (по умолчанию определяется по расширению)",
+    )
+    import_parser.add_argument(
+        "--category",
+        dest="category",
+        default=DEFAULT_CATEGORY,
+        help="Категория для строк без категории",
+    )
+    import_parser.add_argument(
+        "--delimiter",
+        dest="delimiter",
+        default=",",
+        help="Разделитель колонок CSV (по умолчанию ',')",
+    )
+    import_parser.add_argument(
+        "--chunk-size",
+        dest="chunk_size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=(
+            "Сколько строк вставлять за один executemany "
+            f"(по умолчанию {DEFAULT_CHUNK_SIZE})"
+        ),
+    )
+
+    # rebuild-rollups
+    subparsers.add_parser(
+        "rebuild-rollups",
+        help="Пересчитать дневные итоги и баланс из таблицы транзакций",
+    )
+
+    # flush
+    flush_parser = subparsers.add_parser(
+        "flush", help="Перенести транзакции из очереди --spool в базу"
+    )
+    flush_parser.add_argument(
+        "--interval",
+        dest="interval",
+        type=float,
+        metavar="SECONDS",
+        help="Не завершаться, а переносить очередь каждые SECONDS секунд",
+    )
+
+    # shell
+    subparsers.add_parser(
+        "shell",
+        help=(
+            "Читать команды из stdin (add, list, summary, ...) без перезапуска "
+            "процесса; exit — выход, commit — зафиксировать сейчас"
+        ),
+    )
+
     return parser
 
 
 def main(argv: Optional[List[str]] = None) -> None:
+    started = time.perf_counter()
     parser = create_parser()
     args = parser.parse_args(argv)
+    if args.command is None and args.batch_path is None:
+        parser.error("укажите команду или --batch FILE")
+    if args.command is not None and args.batch_path is not None:
+        parser.error("--batch нельзя совмещать с командой")
+    if args.commit_every is not None and args.commit_every <= 0:
+        parser.error("--commit-every должен быть больше нуля")
+    if args.db_busy_timeout is not None and args.db_busy_timeout < 0:
+        parser.error("--db-busy-timeout не может быть отрицательным")
+    if args.spool_dir is not None and args.command not in SPOOL_COMMANDS + ("flush",):
+        parser.error("--spool работает только с командами add, import и flush")
+    if args.command == "flush":
+        if args.spool_dir is None:
+            parser.error("flush: укажите очередь --spool DIR")
+        if args.partitions_dir is not None:
+            parser.error("flush не поддерживает --partitions")
+        if args.interval is not None and args.interval <= 0:
+            parser.error("--interval должен быть больше нуля")
+
+    timings = None
+    if args.timings:
+        timings = Timings()
+        timings.add("parse", time.perf_counter() - started)
+    profiler = None
+    if args.profile_path:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        # "other" — всё, что не попало в отдельные этапы
+        with stage(timings, "other"):
+            journal_mode = args.db_journal_mode
+            busy_timeout_ms = args.db_busy_timeout
+            write_retries = 0
+            if args.concurrent:
+                journal_mode = journal_mode or "wal"
+                if busy_timeout_ms is None:
+                    busy_timeout_ms = CONCURRENT_BUSY_TIMEOUT_MS
+                write_retries = CONCURRENT_WRITE_RETRIES
+            storage_options = dict(
+                journal_mode=journal_mode,
+                synchronous=args.db_synchronous,
+                cache_size_kib=args.db_cache_size,
+                mmap_size=(
+                    args.db_mmap_size * 1024 * 1024
+                    if args.db_mmap_size is not None
+                    else None
+                ),
+                busy_timeout=(
+                    busy_timeout_ms / 1000 if busy_timeout_ms is not None else None
+                ),
+                write_retries=write_retries,
+            )
+            storage: Union[Storage, "PartitionedStorage", "Spool"]
+            if args.spool_dir is not None and args.command in SPOOL_COMMANDS:
+                from .spool import Spool
+
+                storage = Spool(args.spool_dir)
+            elif args.partitions_dir is not None:
+                from .partitions import PartitionedStorage
+
+                if args.workers is not None and args.workers <= 0:
+                    parser.error("--workers должен быть больше нуля")
+                storage = PartitionedStorage(
+                    args.partitions_dir,
+                    workers=args.workers,
+                    timings=timings,
+                    **storage_options,
+                )
+            else:
+                storage = Storage(args.db_path, timings=timings, **storage_options)
+            with storage:
+                if args.batch_path is not None:
+                    exit_code = run_batch(parser, args, storage, timings)
+                elif args.command == "shell":
+                    exit_code = run_shell(parser, args, storage, timings)
+                else:
+                    run_command(parser, args, storage, timings)
+                    exit_code = 0
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_path)
+            print(f"Профиль сохранён в {args.profile_path}", file=sys.stderr)
+        if timings is not None:
+            sys.stdout.flush()
+            timings.report()
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def _read_lines(stream, prompt: Optional[str]) -> Iterator[str]:
+    # с prompt — через input(): в терминале работает редактирование строки
+    if prompt is None:
+        yield from stream
+        return
+    while True:
+        try:
+            yield input(prompt)
+        except EOFError:
+            print()
+            return
+
+
+def run_batch(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    storage: Union[Storage, "PartitionedStorage"],
+    timings: Optional[Timings] = None,
+) -> int:
+    commit_every = args.commit_every or DEFAULT_COMMIT_EVERY
+    if args.batch_path == "-":
+        return run_script(
+            parser, sys.stdin, storage, commit_every, True, timings=timings
+        )
+    try:
+        with open(args.batch_path, encoding="utf-8") as stream:
+            return run_script(
+                parser, stream, storage, commit_every, True, timings=timings
+            )
+    except OSError as exc:
+        parser.exit(1, f"Ошибка чтения {args.batch_path}: {exc}\n")
+
+
+def run_shell(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    storage: Union[Storage, "PartitionedStorage"],
+    timings: Optional[Timings] = None,
+) -> int:
+    # В терминале каждая команда фиксируется сразу; из конвейера
+    # (printf ... | tracker shell) — группами, как --batch, но без остановки
+    # на ошибках.
+    interactive = sys.stdin.isatty()
+    commit_every = args.commit_every or (1 if interactive else DEFAULT_COMMIT_EVERY)
+    lines = _read_lines(sys.stdin, SHELL_PROMPT if interactive else None)
+    return run_script(parser, lines, storage, commit_every, False, timings=timings)
 
-    storage = Storage(args.db_path)
 
+def run_script(
+    parser: argparse.ArgumentParser,
+    lines: Iterable[str],
+    storage: Union[Storage, "PartitionedStorage"],
+    commit_every: int,
+    stop_on_error: bool,
+    timings: Optional[Timings] = None,
+) -> int:
+    # Команды выполняются в одном процессе и одном соединении: запуск
+    # интерпретатора, импорты и открытие базы оплачиваются один раз.
+    # Записи копятся в транзакции и фиксируются раз в commit_every команд
+    # (и в конце); каждая команда — в своей точке сохранения, поэтому
+    # упавшая команда откатывается целиком, не задевая соседние.
+    # Возвращает код выхода: 1, если была ошибка.
+    if isinstance(storage, Storage):
+        # balance --at вперемешку с add задним числом: отвечает индекс
+        # в памяти, который add обновляет сам, а не пересчёт daily_balance
+        # от изменённого дня при каждом запросе
+        storage.balance_index()
+    numbered = enumerate(lines, 1)
+    exit_code = 0
+    finished = False
+    while not finished:
+        finished = True
+        pending = 0
+        with storage.grouped_commits():
+            for number, line in numbered:
+                try:
+                    argv = shlex.split(line, comments=True)
+                except ValueError as exc:
+                    print(f"Строка {number}: {exc}", file=sys.stderr)
+                    exit_code = 1
+                    if stop_on_error:
+                        break
+                    continue
+                if not argv:
+                    continue
+                if argv[0] in SHELL_EXIT:
+                    break
+                if argv == ["commit"]:
+                    finished = False
+                    break
+
+                ok = _run_line(parser, argv, storage, timings)
+                # вывод команды — до следующего приглашения или ошибки
+                sys.stdout.flush()
+                if not ok:
+                    print(f"Строка {number}: команда не выполнена", file=sys.stderr)
+                    exit_code = 1
+                    if stop_on_error:
+                        break
+                    continue
+                pending += 1
+                if pending >= commit_every:
+                    finished = False
+                    break
+    return exit_code
+
+
+def _run_line(
+    parser: argparse.ArgumentParser,
+    argv: List[str],
+    storage: Union[Storage, "PartitionedStorage"],
+    timings: Optional[Timings] = None,
+) -> bool:
+    # argparse и run_command сообщают об ошибках через SystemExit —
+    # в пакетном режиме это ошибка строки, а не выход из процесса.
+    try:
+        with stage(timings, "parse"):
+            args = parser.parse_args(argv)
+        if args.command in (None, "shell", "flush") or args.batch_path:
+            print("Внутри shell/--batch эта команда недоступна", file=sys.stderr)
+            return False
+        with storage.savepoint():
+            run_command(parser, args, storage, timings)
+    except SystemExit as exc:
+        # --help и подобное завершаются с кодом 0
+        return not exc.code
+    except (ValueError, sqlite3.Error) as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        return False
+    return True
+
+
+def run_command(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    storage: Union[Storage, "PartitionedStorage", "Spool"],
+    timings: Optional[Timings] = None,
+) -> None:
     if args.command == "add":
         tx = Transaction(
             id=None,
@@ -137,25 +688,121 @@ def main(argv: Optional[List[str]] = None) -> None:
             created_at=datetime.now(),
         )
         saved = storage.add_transaction(tx)
-        print(f"Добавлена транзакция #{saved.id}")
+        if saved.id is None:
+            print(f"Транзакция записана в очередь {args.spool_dir}")
+        else:
+            print(f"Добавлена транзакция #{saved.id}")
 
     elif args.command == "list":
         from_date = parse_date_or_none(args.from_date)
         to_date = parse_date_or_none(args.to_date)
-        transactions = storage.list_transactions(
+        if args.limit is not None and args.limit < 0:
+            parser.error("--limit не может быть отрицательным")
+        if args.offset < 0:
+            parser.error("--offset не может быть отрицательным")
+        transactions = storage.iter_transactions(
             from_date=from_date,
             to_date=to_date,
             category=args.category,
+            limit=args.limit,
+            offset=args.offset,
+            after_id=args.after_id,
+        )
+        # чтение и преобразование строк идут внутри печати (поток),
+        # но учитываются в своих этапах query/convert
+        with stage(timings, "print"):
+            print_transactions(transactions)
+
+    elif args.command == "search":
+        if args.limit < 0:
+            parser.error("--limit не может быть отрицательным")
+        transactions = storage.search_transactions(
+            " ".join(args.query),
+            from_date=parse_date_or_none(args.from_date),
+            to_date=parse_date_or_none(args.to_date),
+            limit=args.limit or None,
+            raw=args.raw,
+            order=args.order,
         )
-        print_transactions(transactions)
+        try:
+            with stage(timings, "print"):
+                print_transactions(transactions)
+        except sqlite3.OperationalError as exc:
+            # например, синтаксическая ошибка в запросе --raw
+            parser.exit(1, f"Ошибка поиска: {exc}\n")
 
     elif args.command == "summary":
         from_date = parse_date_or_none(args.from_date)
         to_date = parse_date_or_none(args.to_date)
-        transactions = storage.list_transactions(
-            from_date=from_date,
-            to_date=to_date,
-            category=None,
+        engine = args.engine
+        if engine == "numpy" and not HAS_NUMPY:
+            print("NumPy не установлен, используется движок python.", file=sys.stderr)
+            engine = "python"
+
+        summary, series = storage.summary_report(
+            from_date=from_date, to_date=to_date, engine=engine, period=args.period
         )
-        summary = compute_summary(transactions)
-        print_summary(summary)
+        with stage(timings, "print"):
+            print_summary(summary)
+            if series is not None:
+                print()
+                print_series(series, args.period)
+
+    elif args.command == "balance":
+        if args.series:
+            series = storage.iter_balance_series(
+                from_date=parse_date_or_none(args.from_date),
+                to_date=parse_date_or_none(args.to_date),
+            )
+            with stage(timings, "print"):
+                print_balance_series(series)
+        else:
+            at_date = parse_date_or_today(args.at_date)
+            balance = storage.balance_at(at_date)
+            with stage(timings, "print"):
+                print(f"Баланс на {at_date.isoformat()}: {balance:.2f}")
+
+    elif args.command == "import":
+        if args.chunk_size <= 0:
+            parser.error("--chunk-size должен быть больше нуля")
+        if len(args.delimiter) != 1:
+            parser.error("--delimiter должен быть одним символом")
+        started = time.perf_counter()
+        try:
+            count = storage.add_transactions(
+                iter_file_transactions(
+                    args.file,
+                    file_format=args.file_format,
+                    default_category=args.category,
+                    delimiter=args.delimiter,
+                ),
+                chunk_size=args.chunk_size,
+            )
+        except (OSError, ValueError) as exc:
+            parser.exit(1, f"Ошибка импорта: {exc}\n")
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0.0
+        label = "Записано в очередь" if args.spool_dir else "Импортировано"
+        print(f"{label} транзакций: {count} за {elapsed:.2f} с ({rate:.0f} строк/с)")
+
+    elif args.command == "flush":
+        from .spool import Spool
+
+        spool = Spool(args.spool_dir)
+        try:
+            while True:
+                try:
+                    count = spool.flush(storage)
+                except ValueError as exc:
+                    parser.exit(1, f"Ошибка очереди: {exc}\n")
+                if count or args.interval is None:
+                    print(f"Из очереди перенесено транзакций: {count}", flush=True)
+                if args.interval is None:
+                    break
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+    elif args.command == "rebuild-rollups":
+        days = storage.rebuild_rollups()
+        print(f"Дневные итоги пересчитаны: дней — {days}")
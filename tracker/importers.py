@@ -0,0 +1,129 @@
+import csv
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from .models import Transaction
+
+DEFAULT_CATEGORY = "импорт"
+
+_OFX_TAG_RE = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def parse_amount(value: str) -> float:
+    cleaned = value.strip().replace("\u00a0", "").replace(" ", "").replace(",", ".")
+    return float(cleaned)
+
+
+def _make_transaction(
+    tx_date: date,
+    amount: float,
+    kind: Optional[str],
+    category: str,
+    description: str,
+    created_at: datetime,
+) -> Transaction:
+    if not kind:
+        kind = "expense" if amount < 0 else "income"
+    if kind not in ("income", "expense"):
+        raise ValueError(f"неизвестный тип транзакции: {kind!r}")
+    return Transaction(
+        id=None,
+        date=tx_date,
+        amount=abs(amount),
+        kind=kind,
+        category=category,
+        description=description,
+        created_at=created_at,
+    )
+
+
+def iter_csv_transactions(
+    path: Path,
+    default_category: str = DEFAULT_CATEGORY,
+    delimiter: str = ",",
+    encoding: str = "utf-8-sig",
+) -> Iterator[Transaction]:
+    # Ожидаемые колонки: date, amount, [kind], [category], [description].
+    # Если kind не указан, тип определяется по знаку суммы.
+    created_at = datetime.now().replace(microsecond=0)
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        if not reader.fieldnames or not {"date", "amount"} <= set(reader.fieldnames):
+            raise ValueError(f"{path}: в CSV нужны колонки date и amount")
+        for row in reader:
+            try:
+                yield _make_transaction(
+                    tx_date=date.fromisoformat(row["date"].strip()),
+                    amount=parse_amount(row["amount"]),
+                    kind=(row.get("kind") or "").strip(),
+                    category=(row.get("category") or "").strip() or default_category,
+                    description=(row.get("description") or "").strip(),
+                    created_at=created_at,
+                )
+            except ValueError as exc:
+                raise ValueError(f"{path}:{reader.line_num}: {exc}") from exc
+
+
+def _ofx_date(value: str) -> date:
+    # DTPOSTED: YYYYMMDD[HHMMSS[.XXX][[TZ]]]
+    return date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+
+
+def _ofx_transaction(
+    fields: Dict[str, str], default_category: str, created_at: datetime
+) -> Transaction:
+    description = fields.get("NAME", "")
+    memo = fields.get("MEMO", "")
+    if memo and memo != description:
+        description = f"{description} {memo}".strip()
+    return _make_transaction(
+        tx_date=_ofx_date(fields["DTPOSTED"]),
+        amount=parse_amount(fields["TRNAMT"]),
+        kind=None,
+        category=default_category,
+        description=description,
+        created_at=created_at,
+    )
+
+
+def iter_ofx_transactions(
+    path: Path,
+    default_category: str = DEFAULT_CATEGORY,
+    encoding: str = "utf-8",
+) -> Iterator[Transaction]:
+    # Потоковый разбор блоков <STMTTRN>; подходит и для SGML (OFX 1.x),
+    # и для XML (OFX 2.x), файл целиком в память не читается.
+    created_at = datetime.now().replace(microsecond=0)
+    fields: Optional[Dict[str, str]] = None
+    with open(path, encoding=encoding, errors="replace") as f:
+        for line_num, line in enumerate(f, start=1):
+            for closing, tag, value in _OFX_TAG_RE.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if closing and fields is not None:
+                        try:
+                            yield _ofx_transaction(fields, default_category, created_at)
+                        except (KeyError, ValueError) as exc:
+                            raise ValueError(f"{path}:{line_num}: {exc}") from exc
+                        fields = None
+                    elif not closing:
+                        fields = {}
+                elif fields is not None and not closing:
+                    fields[tag] = value.strip()
+
+
+def iter_file_transactions(
+    path: Path,
+    file_format: str = "auto",
+    default_category: str = DEFAULT_CATEGORY,
+    delimiter: str = ",",
+) -> Iterator[Transaction]:
+    if file_format == "auto":
+        file_format = "ofx" if Path(path).suffix.lower() in (".ofx", ".qfx") else "csv"
+    if file_format == "ofx":
+        return iter_ofx_transactions(path, default_category=default_category)
+    return iter_csv_transactions(
+        path, default_category=default_category, delimiter=delimiter
+    )
@@ -1,11 +1,24 @@
+from array import array
 from dataclasses import dataclass
 from datetime import datetime, date
-from typing import Optional, Literal
+from typing import Dict, Iterable, Iterator, List, Optional, Literal
 
 Kind = Literal["income", "expense"]
 
+KIND_EXPENSE = 0
+KIND_INCOME = 1
 
-@dataclass
+
+def to_cents(amount: float) -> int:
+    # Суммы хранятся и складываются в копейках (целых), без дрейфа float
+    return int(round(amount * 100))
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+@dataclass(slots=True)
 class Transaction:
     id: Optional[int]
     date: date
@@ -14,3 +27,75 @@ class Transaction:
     category: str
     description: str
     created_at: datetime
+
+
+class TransactionBatch:
+    # Колоночное представление для аналитики: вместо объекта на строку —
+    # массивы array с id, днями (date.toordinal()), суммами в копейках и кодами
+    # типа/категории. Названия категорий хранятся один раз в categories.
+    __slots__ = (
+        "ids",
+        "days",
+        "amounts_cents",
+        "kinds",
+        "category_codes",
+        "categories",
+        "_category_index",
+    )
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.days = array("i")
+        self.amounts_cents = array("q")
+        self.kinds = array("b")
+        self.category_codes = array("i")
+        self.categories: List[str] = []
+        self._category_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def category_code(self, category: str) -> int:
+        code = self._category_index.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self._category_index[category] = code
+        return code
+
+    def append(
+        self,
+        tx_id: Optional[int],
+        day: int,
+        amount_cents: int,
+        kind: str,
+        category: str,
+    ) -> None:
+        self.ids.append(tx_id if tx_id is not None else 0)
+        self.days.append(day)
+        self.amounts_cents.append(amount_cents)
+        self.kinds.append(KIND_INCOME if kind == "income" else KIND_EXPENSE)
+        self.category_codes.append(self.category_code(category))
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> "TransactionBatch":
+        batch = cls()
+        for tx in transactions:
+            batch.append(
+                tx.id, tx.date.toordinal(), to_cents(tx.amount), tx.kind, tx.category
+            )
+        return batch
+
+    def iter_rows(self) -> Iterator[tuple]:
+        # (id, date, amount, kind, category) — без description/created_at
+        categories = self.categories
+        for tx_id, day, cents, kind, code in zip(
+            self.ids, self.days, self.amounts_cents, self.kinds, self.category_codes
+        ):
+            yield (
+                tx_id,
+                date.fromordinal(day),
+                from_cents(cents),
+                "income" if kind == KIND_INCOME else "expense",
+                categories[code],
+            )
@@ -0,0 +1,346 @@
+import os
+import re
+import sqlite3
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from itertools import chain, islice
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .models import Transaction, from_cents, to_cents
+from .profiling import Timings, stage
+from .reports import SeriesRow, merge_series, merge_summaries
+from .storage import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_FETCH_SIZE,
+    INSERT_TRANSACTION_SQL,
+    Storage,
+    _transaction_row,
+)
+
+PARTITION_NAME = "finance-{year}.db"
+PARTITION_RE = re.compile(r"^finance-(\d{4})\.db$")
+# id транзакций года Y начинаются с Y * ID_STRIDE + 1: id уникальны во всех
+# разделах, а по id сразу видно, в каком разделе лежит строка
+ID_STRIDE = 10**9
+
+
+def partition_year(tx_id: int) -> int:
+    return tx_id // ID_STRIDE
+
+
+def _summary_worker(
+    path: str,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    engine: str,
+    period: Optional[str],
+) -> Tuple[Dict[str, Any], Optional[List[SeriesRow]]]:
+    # Выполняется в отдельном процессе: своё соединение к файлу раздела.
+    with Storage(Path(path)) as storage:
+        return storage.summary_report(
+            from_date=from_date, to_date=to_date, engine=engine, period=period
+        )
+
+
+class PartitionedStorage:
+    # Транзакции хранятся по годам: DIR/finance-2023.db, DIR/finance-2024.db...
+    # Каждый раздел — обычная база Storage со своей схемой и триггерами.
+    # Разделы открываются по требованию (отдельными соединениями, а не
+    # ATTACH — у SQLite по умолчанию не больше 10 присоединённых баз),
+    # и запросы с --from/--to не открывают лишние годы.
+    def __init__(
+        self,
+        directory: Path,
+        workers: Optional[int] = None,
+        timings: Optional[Timings] = None,
+        **storage_options: Any,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.timings = timings
+        self.storage_options = storage_options
+        self._partitions: Dict[int, Storage] = {}
+        # активные grouped_commits/savepoint: в них входят и разделы,
+        # открытые уже внутри блока
+        self._scopes: List[Tuple[ExitStack, Callable[[Storage], ContextManager]]] = []
+
+    def __enter__(self) -> "PartitionedStorage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for storage in self._partitions.values():
+            storage.close()
+        self._partitions.clear()
+
+    def partition_path(self, year: int) -> Path:
+        return self.directory / PARTITION_NAME.format(year=year)
+
+    def years(
+        self, from_date: Optional[date] = None, to_date: Optional[date] = None
+    ) -> List[int]:
+        # существующие разделы, пересекающиеся с периодом
+        years = []
+        for path in self.directory.iterdir():
+            match = PARTITION_RE.match(path.name)
+            if not match:
+                continue
+            year = int(match.group(1))
+            if from_date and year < from_date.year:
+                continue
+            if to_date and year > to_date.year:
+                continue
+            years.append(year)
+        return sorted(years)
+
+    def partition(self, year: int) -> Storage:
+        storage = self._partitions.get(year)
+        if storage is None:
+            path = self.partition_path(year)
+            is_new = not path.exists()
+            storage = Storage(path, timings=self.timings, **self.storage_options)
+            if is_new:
+                with storage._write() as conn:
+                    conn.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                        ("transactions", year * ID_STRIDE),
+                    )
+            self._partitions[year] = storage
+            for stack, scope in self._scopes:
+                stack.enter_context(scope(storage))
+        return storage
+
+    @contextmanager
+    def _each_partition(
+        self, scope: Callable[[Storage], ContextManager]
+    ) -> Iterator[None]:
+        with ExitStack() as stack:
+            self._scopes.append((stack, scope))
+            try:
+                for storage in list(self._partitions.values()):
+                    stack.enter_context(scope(storage))
+                yield
+            finally:
+                self._scopes.pop()
+
+    def _in_transaction(self) -> bool:
+        # есть ли в разделах записи, которые видит только этот процесс
+        return bool(self._scopes) or any(
+            storage._conn is not None and storage._conn.in_transaction
+            for storage in self._partitions.values()
+        )
+
+    def grouped_commits(self) -> ContextManager:
+        return self._each_partition(Storage.grouped_commits)
+
+    def savepoint(self) -> ContextManager:
+        return self._each_partition(Storage.savepoint)
+
+    def add_transaction(self, tx: Transaction) -> Transaction:
+        return self.partition(tx.date.year).add_transaction(tx)
+
+    def add_transactions(
+        self,
+        transactions: Iterable[Transaction],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> int:
+        # Строки раскладываются по годам; фиксация во всех затронутых
+        # разделах — в конце, при ошибке откатываются все.
+        count = 0
+        touched: Dict[int, sqlite3.Connection] = {}
+        # внутри grouped_commits фиксирует группа
+        grouped = bool(self._scopes)
+        iterator = iter(transactions)
+        try:
+            while True:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                by_year: Dict[int, list] = {}
+                for tx in chunk:
+                    by_year.setdefault(tx.date.year, []).append(_transaction_row(tx))
+                for year, rows in by_year.items():
+                    conn = touched.get(year)
+                    if conn is None:
+                        storage = self.partition(year)
+                        conn = touched[year] = storage._connect()
+                        if not grouped:
+                            # как Storage._write: BEGIN IMMEDIATE с повторами
+                            storage._begin(conn)
+                    with stage(self.timings, "write"):
+                        conn.executemany(INSERT_TRANSACTION_SQL, rows)
+                count += len(chunk)
+            if not grouped:
+                with stage(self.timings, "write"):
+                    for conn in touched.values():
+                        conn.commit()
+        except BaseException:
+            if not grouped:
+                for conn in touched.values():
+                    if conn.in_transaction:
+                        conn.rollback()
+            raise
+        return count
+
+    def iter_transactions(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        after_id: Optional[int] = None,
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Transaction]:
+        # Разделы идут по годам, поэтому порядок (date, id) сохраняется
+        # простой конкатенацией.
+        years = self.years(from_date, to_date)
+        after_year = None
+        if after_id is not None:
+            after_year = partition_year(after_id)
+            years = [year for year in years if year >= after_year]
+
+        rows = chain.from_iterable(
+            self.partition(year).iter_transactions(
+                from_date=from_date,
+                to_date=to_date,
+                category=category,
+                after_id=after_id if year == after_year else None,
+                batch_size=batch_size,
+            )
+            for year in years
+        )
+        stop = offset + limit if limit is not None else None
+        return islice(rows, offset, stop)
+
+    def list_transactions(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        category: Optional[str] = None,
+    ) -> List[Transaction]:
+        return list(
+            self.iter_transactions(
+                from_date=from_date, to_date=to_date, category=category
+            )
+        )
+
+    def search_transactions(
+        self,
+        query: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        raw: bool = False,
+        order: str = "rank",
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Transaction]:
+        # Сначала свежие годы. bm25 у разных файлов считается по своей
+        # статистике и между разделами не сравним, поэтому rank действует
+        # внутри года.
+        rows = chain.from_iterable(
+            self.partition(year).search_transactions(
+                query,
+                from_date=from_date,
+                to_date=to_date,
+                limit=limit,
+                raw=raw,
+                order=order,
+                batch_size=batch_size,
+            )
+            for year in reversed(self.years(from_date, to_date))
+        )
+        return islice(rows, limit)
+
+    def summary_report(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        engine: str = "sql",
+        period: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[List[SeriesRow]]]:
+        # Каждый раздел считается в своём процессе, результаты сводятся
+        # в tracker.reports. Один раздел или один worker — без пула.
+        # Внутри grouped_commits (shell, --batch) тоже без пула: процессы
+        # открывают свои соединения и незафиксированных строк не видят.
+        years = self.years(from_date, to_date)
+        if len(years) <= 1 or self.workers <= 1 or self._in_transaction():
+            parts = [
+                self.partition(year).summary_report(
+                    from_date=from_date, to_date=to_date, engine=engine, period=period
+                )
+                for year in years
+            ]
+        else:
+            # импорт пула процессов заметно удлиняет запуск — только здесь
+            from concurrent.futures import ProcessPoolExecutor
+
+            paths = [str(self.partition_path(year)) for year in years]
+            workers = min(self.workers, len(paths))
+            with stage(self.timings, "query"):
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    parts = list(
+                        pool.map(
+                            _summary_worker,
+                            paths,
+                            [from_date] * len(paths),
+                            [to_date] * len(paths),
+                            [engine] * len(paths),
+                            [period] * len(paths),
+                        )
+                    )
+
+        with stage(self.timings, "compute"):
+            summary = merge_summaries(part[0] for part in parts)
+            series = None
+            if period:
+                series = merge_series(part[1] for part in parts)
+        return summary, series
+
+    def _year_end_cents(self, year: int) -> int:
+        return to_cents(self.partition(year).balance_at(date(year, 12, 31)))
+
+    def balance_at(self, day: date) -> float:
+        # итог всех прошлых лет + баланс текущего года на день
+        cents = 0
+        for year in self.years(to_date=day):
+            if year < day.year:
+                cents += self._year_end_cents(year)
+            else:
+                cents += to_cents(self.partition(year).balance_at(day))
+        return from_cents(cents)
+
+    def iter_balance_series(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Tuple[date, float, float]]:
+        carry = 0
+        for year in self.years(to_date=to_date):
+            if from_date and year < from_date.year:
+                carry += self._year_end_cents(year)
+                continue
+            series = self.partition(year).iter_balance_series(
+                from_date=from_date, to_date=to_date, batch_size=batch_size
+            )
+            for day, net, balance in series:
+                yield day, net, from_cents(to_cents(balance) + carry)
+            carry += self._year_end_cents(year)
+
+    def rebuild_rollups(self) -> int:
+        return sum(self.partition(year).rebuild_rollups() for year in self.years())
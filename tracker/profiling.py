@@ -0,0 +1,55 @@
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, List, Optional, TextIO
+
+
+class Timings:
+    # Время по этапам команды (parse, connect, query, convert, print, ...).
+    # Этапы могут вкладываться: у внешнего этапа учитывается только его
+    # собственное время, без вложенных, поэтому сумма равна общему времени.
+    def __init__(self) -> None:
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        # [name, начало, время вложенных этапов]
+        self._stack: List[list] = []
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    @contextmanager
+    def stage(self, name: str):
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._stack.pop()
+            self.add(name, elapsed - frame[2])
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def report(self, file: TextIO = sys.stderr) -> None:
+        total = sum(self.totals.values())
+        print(f"{'Этап':<10} {'Вызовов':>8} {'мс':>10} {'%':>6}", file=file)
+        print("-" * 37, file=file)
+        for name, seconds in sorted(
+            self.totals.items(), key=lambda item: item[1], reverse=True
+        ):
+            share = seconds / total * 100 if total else 0.0
+            print(
+                f"{name:<10} {self.calls[name]:>8} {seconds * 1000:>10.2f} "
+                f"{share:>6.1f}",
+                file=file,
+            )
+        print("-" * 37, file=file)
+        print(f"{'Итого':<10} {'':>8} {total * 1000:>10.2f}", file=file)
+
+
+def stage(timings: Optional[Timings], name: str) -> ContextManager:
+    # Без замеров — пустой контекст, чтобы горячие пути не ветвились.
+    if timings is None:
+        return nullcontext()
+    return timings.stage(name)
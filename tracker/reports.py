@@ -1,29 +1,246 @@
-from typing import Iterable, Dict, Any
+from datetime import date
+from importlib.util import find_spec
+from typing import Iterable, Dict, Any, List, Tuple, Union
 
-from .models import Transaction
+from .models import KIND_INCOME, Transaction, TransactionBatch, from_cents, to_cents
 
+# NumPy не обязателен: без него работает движок python. Сам модуль
+# импортируется при первом расчёте движком numpy (десятки миллисекунд),
+# а не при каждом запуске CLI.
+HAS_NUMPY = find_spec("numpy") is not None
+_np = None
 
-def compute_summary(transactions: Iterable[Transaction]) -> Dict[str, Any]:
-    total_income = 0.0
-    total_expenses = 0.0
-    by_category: Dict[str, float] = {}
+
+def _numpy():
+    global _np
+    if _np is None:
+        import numpy
+
+        _np = numpy
+    return _np
+
+
+ENGINES = ("python", "numpy")
+PERIODS = ("month", "week")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+SeriesRow = Tuple[str, float, float]
+
+
+def resolve_engine(engine: str) -> str:
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок отчётов: {engine!r}")
+    if engine == "numpy" and not HAS_NUMPY:
+        return "python"
+    return engine
+
+
+def compute_summary(
+    transactions: Union[Iterable[Transaction], TransactionBatch],
+    engine: str = "python",
+) -> Dict[str, Any]:
+    if isinstance(transactions, TransactionBatch):
+        if resolve_engine(engine) == "numpy":
+            return _compute_batch_summary_numpy(transactions)
+        return _compute_batch_summary(transactions)
+
+    total_income = 0
+    total_expenses = 0
+    by_category: Dict[str, int] = {}
 
     for tx in transactions:
+        cents = to_cents(tx.amount)
         if tx.kind == "income":
-            total_income += tx.amount
+            total_income += cents
         else:
-            total_expenses += tx.amount
-            by_category[tx.category] = by_category.get(tx.category, 0.0) + tx.amount
+            total_expenses += cents
+            by_category[tx.category] = by_category.get(tx.category, 0) + cents
+
+    return _summary_from_cents(total_income, total_expenses, by_category)
 
-    balance = total_income - total_expenses
 
+def _summary_from_cents(
+    total_income: int, total_expenses: int, by_category: Dict[str, int]
+) -> Dict[str, Any]:
+    # Всё считается в целых копейках; в рубли переводим только на выходе
     return {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "balance": balance,
-        "by_category": by_category,
+        "total_income": from_cents(total_income),
+        "total_expenses": from_cents(total_expenses),
+        "balance": from_cents(total_income - total_expenses),
+        "by_category": {cat: from_cents(cents) for cat, cents in by_category.items()},
+    }
+
+
+def _compute_batch_summary(batch: TransactionBatch) -> Dict[str, Any]:
+    # Суммы по категориям копятся в списке по коду категории —
+    # без хеширования строк на каждую транзакцию.
+    total_income = 0
+    total_expenses = 0
+    sums = [0] * len(batch.categories)
+    seen = [False] * len(batch.categories)
+
+    columns = zip(batch.amounts_cents, batch.kinds, batch.category_codes)
+    for cents, kind, code in columns:
+        if kind == KIND_INCOME:
+            total_income += cents
+        else:
+            total_expenses += cents
+            sums[code] += cents
+            seen[code] = True
+
+    by_category = {
+        name: sums[code] for code, name in enumerate(batch.categories) if seen[code]
     }
 
+    return _summary_from_cents(total_income, total_expenses, by_category)
+
+
+def _numpy_columns(batch: TransactionBatch):
+    np = _numpy()
+    # array.array отдаёт буфер без копирования
+    amounts = np.frombuffer(batch.amounts_cents, dtype=np.int64)
+    income_mask = np.frombuffer(batch.kinds, dtype=np.int8) == KIND_INCOME
+    return amounts, income_mask
+
+
+def _compute_batch_summary_numpy(batch: TransactionBatch) -> Dict[str, Any]:
+    if not len(batch):
+        return _compute_batch_summary(batch)
+
+    np = _numpy()
+    amounts, income_mask = _numpy_columns(batch)
+    expense_mask = ~income_mask
+    codes = np.frombuffer(batch.category_codes, dtype=np.intc)[expense_mask]
+    expense_amounts = amounts[expense_mask]
+
+    total_income = int(amounts[income_mask].sum())
+    total_expenses = int(expense_amounts.sum())
+
+    # bincount с весами считает во float64: суммы копеек точны до 2**53
+    n_categories = len(batch.categories)
+    sums = np.bincount(codes, weights=expense_amounts, minlength=n_categories)
+    counts = np.bincount(codes, minlength=n_categories)
+
+    by_category = {
+        batch.categories[code]: int(round(sums[code]))
+        for code in np.flatnonzero(counts)
+    }
+
+    return _summary_from_cents(total_income, total_expenses, by_category)
+
+
+def _period_label(day: int, period: str) -> str:
+    if period == "month":
+        return date.fromordinal(day).strftime("%Y-%m")
+    # неделя начинается с понедельника; ordinal 1 (0001-01-01) — понедельник
+    return date.fromordinal(day - (day - 1) % 7).isoformat()
+
+
+def compute_series(
+    batch: TransactionBatch,
+    period: str = "month",
+    engine: str = "python",
+) -> List[SeriesRow]:
+    # Доходы и расходы по месяцам или неделям: [(метка, доходы, расходы)]
+    if period not in PERIODS:
+        raise ValueError(f"Неизвестный период: {period!r}")
+    if resolve_engine(engine) == "numpy" and len(batch):
+        return _compute_series_numpy(batch, period)
+
+    labels: Dict[int, str] = {}
+    income: Dict[str, int] = {}
+    expenses: Dict[str, int] = {}
+
+    for day, cents, kind in zip(batch.days, batch.amounts_cents, batch.kinds):
+        label = labels.get(day)
+        if label is None:
+            label = labels[day] = _period_label(day, period)
+        if kind == KIND_INCOME:
+            income[label] = income.get(label, 0) + cents
+        else:
+            expenses[label] = expenses.get(label, 0) + cents
+
+    return [
+        (label, from_cents(income.get(label, 0)), from_cents(expenses.get(label, 0)))
+        for label in sorted(income.keys() | expenses.keys())
+    ]
+
+
+def _compute_series_numpy(batch: TransactionBatch, period: str) -> List[SeriesRow]:
+    np = _numpy()
+    amounts, income_mask = _numpy_columns(batch)
+    days = np.frombuffer(batch.days, dtype=np.intc)
+
+    if period == "month":
+        keys = (days - _EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]")
+    else:
+        keys = (days - 1) // 7
+
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    income = np.bincount(inverse, weights=np.where(income_mask, amounts, 0))
+    expenses = np.bincount(inverse, weights=np.where(income_mask, 0, amounts))
+
+    if period == "month":
+        labels = [str(key) for key in uniq]
+    else:
+        labels = [date.fromordinal(int(key) * 7 + 1).isoformat() for key in uniq]
+
+    return [
+        (label, from_cents(int(round(inc))), from_cents(int(round(exp))))
+        for label, inc, exp in zip(labels, income, expenses)
+    ]
+
+
+def summary_from_groups(groups: Iterable[Tuple[str, str, int]]) -> Dict[str, Any]:
+    # groups — уже сгруппированные суммы в копейках (kind, category, cents),
+    # например результат SUM(amount_cents) GROUP BY kind, category.
+    total_income = 0
+    total_expenses = 0
+    by_category: Dict[str, int] = {}
+
+    for kind, category, cents in groups:
+        if kind == "income":
+            total_income += cents
+        else:
+            total_expenses += cents
+            by_category[category] = by_category.get(category, 0) + cents
+
+    return _summary_from_cents(total_income, total_expenses, by_category)
+
+
+def merge_summaries(summaries: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    # Сводки по частям данных (например, по годовым разделам) -> одна.
+    # Суммы в сводке — from_cents(копейки), to_cents возвращает их точно,
+    # поэтому складываем снова в целых копейках.
+    total_income = 0
+    total_expenses = 0
+    by_category: Dict[str, int] = {}
+
+    for summary in summaries:
+        total_income += to_cents(summary["total_income"])
+        total_expenses += to_cents(summary["total_expenses"])
+        for category, amount in summary["by_category"].items():
+            by_category[category] = by_category.get(category, 0) + to_cents(amount)
+
+    return _summary_from_cents(total_income, total_expenses, by_category)
+
+
+def merge_series(parts: Iterable[List[SeriesRow]]) -> List[SeriesRow]:
+    # Неделя на стыке лет попадает в два раздела — строки с одной меткой
+    # складываются.
+    income: Dict[str, int] = {}
+    expenses: Dict[str, int] = {}
+    for series in parts:
+        for label, inc, exp in series:
+            income[label] = income.get(label, 0) + to_cents(inc)
+            expenses[label] = expenses.get(label, 0) + to_cents(exp)
+
+    return [
+        (label, from_cents(income[label]), from_cents(expenses[label]))
+        for label in sorted(income)
+    ]
+
 
 def print_summary(summary: Dict[str, Any]) -> None:
     total_income = summary["total_income"]
@@ -44,3 +261,19 @@ def print_summary(summary: Dict[str, Any]) -> None:
     print("Расходы по категориям:")
     for cat, amount in sorted(by_category.items(), key=lambda x: -x[1]):
         print(f" - {cat:<15} {amount:10.2f}")
+
+
+def print_series(series: List[SeriesRow], period: str) -> None:
+    title = "месяцам" if period == "month" else "неделям"
+    print(f"=== Динамика по {title} ===")
+    if not series:
+        print("Нет транзакций за период.")
+        return
+
+    print("Период     |     Доходы |    Расходы |     Баланс")
+    print("-" * 50)
+    for label, income, expenses in series:
+        print(
+            f"{label:<10} | {income:10.2f} | {expenses:10.2f} | "
+            f"{income - expenses:10.2f}"
+        )
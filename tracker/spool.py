@@ -0,0 +1,129 @@
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, TextIO
+
+from .models import Transaction, from_cents
+from .storage import DEFAULT_CHUNK_SIZE, Storage, _transaction_row
+
+SEGMENT_SUFFIX = ".jsonl"
+TEMP_SUFFIX = ".tmp"
+
+
+def _read_segment(path: Path, stream: TextIO) -> Iterator[Transaction]:
+    for line_number, line in enumerate(stream, 1):
+        try:
+            date_str, cents, kind, category, description, created_at = json.loads(
+                line
+            )
+            yield Transaction(
+                id=None,
+                date=date.fromisoformat(date_str),
+                amount=from_cents(cents),
+                kind=kind,
+                category=category,
+                description=description,
+                created_at=datetime.fromisoformat(created_at),
+            )
+        except ValueError as exc:
+            raise ValueError(f"{path}:{line_number}: {exc}") from exc
+
+
+class Spool:
+    # Очередь записи для многих процессов-писателей: вместо ожидания
+    # блокировки SQLite каждый вызов add_transaction(s) кладёт в каталог
+    # очереди свой сегмент (JSON-строки), а один flush переносит все
+    # сегменты в базу одной транзакцией.
+    # Сегмент пишется во временный файл и появляется под настоящим именем
+    # только целиком (os.replace), поэтому flush не видит недописанных.
+    # Имена перенесённых сегментов фиксируются в той же транзакции
+    # (spool_applied): сбой между COMMIT и удалением файлов не даёт дублей.
+    def __init__(self, directory: Path, fsync: bool = True) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+
+    def __enter__(self) -> "Spool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    def add_transaction(self, tx: Transaction) -> Transaction:
+        # id будет присвоен только при переносе в базу
+        self.add_transactions([tx])
+        return tx
+
+    def add_transactions(
+        self,
+        transactions: Iterable[Transaction],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> int:
+        # Один вызов — один сегмент: при переносе он попадает в базу целиком.
+        # Имя начинается со времени, так что flush идёт в порядке записи.
+        name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path = self.directory / (name + SEGMENT_SUFFIX)
+        temp_path = self.directory / (name + TEMP_SUFFIX)
+        rows = map(_transaction_row, transactions)
+        count = 0
+        try:
+            with temp_path.open("w", encoding="utf-8") as stream:
+                while True:
+                    chunk = list(islice(rows, chunk_size))
+                    if not chunk:
+                        break
+                    stream.writelines(
+                        json.dumps(row, ensure_ascii=False) + "\n" for row in chunk
+                    )
+                    count += len(chunk)
+                if self.fsync:
+                    stream.flush()
+                    os.fsync(stream.fileno())
+            if count:
+                os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+        return count
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("*" + SEGMENT_SUFFIX))
+
+    def flush(self, storage: Storage) -> int:
+        # Переносит готовые сегменты в базу, возвращает число транзакций.
+        # Несколько flush одновременно безопасны: сегмент, который уже
+        # перенёс другой процесс, либо отмечен в spool_applied, либо уже
+        # удалён (файл удаляется раньше, чем его имя).
+        segments = self.segments()
+        if not segments:
+            return 0
+        count = 0
+        with storage.grouped_commits():
+            conn = storage._connect()
+            for path in segments:
+                applied = conn.execute(
+                    "SELECT 1 FROM spool_applied WHERE name = ?", (path.name,)
+                ).fetchone()
+                if applied:
+                    continue
+                try:
+                    stream = path.open(encoding="utf-8")
+                except FileNotFoundError:
+                    continue
+                with stream:
+                    count += storage.add_transactions(_read_segment(path, stream))
+                conn.execute(
+                    "INSERT INTO spool_applied (name) VALUES (?)", (path.name,)
+                )
+
+        for path in segments:
+            path.unlink(missing_ok=True)
+        with storage._write() as conn:
+            conn.executemany(
+                "DELETE FROM spool_applied WHERE name = ?",
+                [(path.name,) for path in segments],
+            )
+        return count
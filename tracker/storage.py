@@ -1,72 +1,784 @@
+import random
 import sqlite3
+import time
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .models import Transaction
+from .balance import BalanceIndex
+from .models import Transaction, TransactionBatch, from_cents, to_cents
+from .profiling import Timings, stage
+from .reports import (
+    HAS_NUMPY,
+    SeriesRow,
+    compute_series,
+    compute_summary,
+    summary_from_groups,
+)
+
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_FETCH_SIZE = 500
+
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS_MODES = ("off", "normal", "full", "extra")
+# rank — по релевантности (bm25), recent — сначала последние добавленные
+SEARCH_ORDERS = ("rank", "recent")
+
+# Сколько соединение ждёт чужую блокировку, секунд (как у sqlite3.connect)
+DEFAULT_BUSY_TIMEOUT = 5.0
+# повтор BEGIN IMMEDIATE: случайная задержка от 0 до base * 2**попытка
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 2.0
+# SQLITE_BUSY и SQLITE_LOCKED (младший байт расширенного кода)
+BUSY_ERROR_CODES = (5, 6)
+
+
+INSERT_TRANSACTION_SQL = """
+    INSERT INTO transactions
+        (date, amount_cents, kind, category, description, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+REBUILD_ROLLUPS_SQL = """
+    DELETE FROM daily_totals;
+    INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+    SELECT date, kind, category, SUM(amount_cents), COUNT(*)
+    FROM transactions
+    GROUP BY date, kind, category;
+"""
+
+
+# Нарастающий баланс по дням. Триггеры поддерживают только дневное
+# сальдо (net) и отмечают в balance_state самый ранний изменённый день;
+# колонка balance пересчитывается от него при чтении (REPAIR_BALANCE_SQL) —
+# линейно по числу дней, а не транзакций.
+REBUILD_BALANCE_SQL = """
+    DELETE FROM daily_balance;
+    INSERT INTO daily_balance (date, net, tx_count, balance)
+    SELECT date,
+           SUM(CASE WHEN kind = 'income' THEN amount_cents ELSE -amount_cents END),
+           COUNT(*),
+           0
+    FROM transactions
+    GROUP BY date;
+    UPDATE balance_state SET dirty_from = (SELECT MIN(date) FROM daily_balance);
+"""
+
+REPAIR_BALANCE_SQL = """
+    UPDATE daily_balance
+    SET balance = running.balance
+    FROM (
+        SELECT date,
+               COALESCE(
+                   (SELECT balance FROM daily_balance
+                    WHERE date < :dirty_from ORDER BY date DESC LIMIT 1),
+                   0
+               ) + SUM(net) OVER (ORDER BY date) AS balance
+        FROM daily_balance
+        WHERE date >= :dirty_from
+    ) AS running
+    WHERE daily_balance.date = running.date
+"""
+
+
+# Миграции схемы: элемент с индексом i переводит базу на версию i + 1.
+# Уже выпущенные миграции не меняются — только добавляются новые.
+MIGRATIONS: List[str] = [
+    # 1: исходная таблица
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        kind TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        created_at TEXT NOT NULL
+    );
+    """,
+    # 2: индексы под фильтры и сортировку list/summary
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_date_id
+        ON transactions (date, id);
+    CREATE INDEX IF NOT EXISTS idx_transactions_category_date
+        ON transactions (category, date);
+    """,
+    # 3: покрывающий индекс для агрегации summary без чтения таблицы
+    """
+    CREATE INDEX IF NOT EXISTS idx_transactions_date_kind_category_amount
+        ON transactions (date, kind, category, amount);
+    """,
+    # 4: дневные итоги, которые триггеры поддерживают при каждой записи
+    """
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        date TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount_sum REAL NOT NULL,
+        tx_count INTEGER NOT NULL,
+        PRIMARY KEY (date, kind, category)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_insert
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+        VALUES (NEW.date, NEW.kind, NEW.category, NEW.amount, 1)
+        ON CONFLICT (date, kind, category) DO UPDATE SET
+            amount_sum = amount_sum + excluded.amount_sum,
+            tx_count = tx_count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_delete
+    AFTER DELETE ON transactions
+    BEGIN
+        UPDATE daily_totals SET
+            amount_sum = amount_sum - OLD.amount,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category;
+        DELETE FROM daily_totals
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category
+            AND tx_count <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_daily_totals_update
+    AFTER UPDATE OF date, amount, kind, category ON transactions
+    BEGIN
+        UPDATE daily_totals SET
+            amount_sum = amount_sum - OLD.amount,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category;
+        DELETE FROM daily_totals
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category
+            AND tx_count <= 0;
+        INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+        VALUES (NEW.date, NEW.kind, NEW.category, NEW.amount, 1)
+        ON CONFLICT (date, kind, category) DO UPDATE SET
+            amount_sum = amount_sum + excluded.amount_sum,
+            tx_count = tx_count + 1;
+    END;
+
+    DELETE FROM daily_totals;
+    INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+    SELECT date, kind, category, SUM(amount), COUNT(*)
+    FROM transactions
+    GROUP BY date, kind, category;
+    """,
+    # 5: суммы в целых копейках (amount_cents) вместо REAL; таблица
+    # пересобирается, id и счётчик AUTOINCREMENT сохраняются
+    """
+    CREATE TABLE transactions_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        amount_cents INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT,
+        created_at TEXT NOT NULL
+    );
+    INSERT INTO transactions_new
+        (id, date, amount_cents, kind, category, description, created_at)
+    SELECT id, date, CAST(ROUND(amount * 100) AS INTEGER),
+           kind, category, description, created_at
+    FROM transactions;
+    DELETE FROM sqlite_sequence WHERE name = 'transactions_new';
+    UPDATE sqlite_sequence SET name = 'transactions_new' WHERE name = 'transactions';
+    DROP TABLE transactions;
+    ALTER TABLE transactions_new RENAME TO transactions;
+
+    CREATE INDEX idx_transactions_date_id
+        ON transactions (date, id);
+    CREATE INDEX idx_transactions_category_date
+        ON transactions (category, date);
+    CREATE INDEX idx_transactions_date_kind_category_amount
+        ON transactions (date, kind, category, amount_cents);
+
+    DROP TABLE daily_totals;
+    CREATE TABLE daily_totals (
+        date TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        category TEXT NOT NULL,
+        amount_sum INTEGER NOT NULL,
+        tx_count INTEGER NOT NULL,
+        PRIMARY KEY (date, kind, category)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER trg_daily_totals_insert
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+        VALUES (NEW.date, NEW.kind, NEW.category, NEW.amount_cents, 1)
+        ON CONFLICT (date, kind, category) DO UPDATE SET
+            amount_sum = amount_sum + excluded.amount_sum,
+            tx_count = tx_count + 1;
+    END;
+
+    CREATE TRIGGER trg_daily_totals_delete
+    AFTER DELETE ON transactions
+    BEGIN
+        UPDATE daily_totals SET
+            amount_sum = amount_sum - OLD.amount_cents,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category;
+        DELETE FROM daily_totals
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category
+            AND tx_count <= 0;
+    END;
+
+    CREATE TRIGGER trg_daily_totals_update
+    AFTER UPDATE OF date, amount_cents, kind, category ON transactions
+    BEGIN
+        UPDATE daily_totals SET
+            amount_sum = amount_sum - OLD.amount_cents,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category;
+        DELETE FROM daily_totals
+        WHERE date = OLD.date AND kind = OLD.kind AND category = OLD.category
+            AND tx_count <= 0;
+        INSERT INTO daily_totals (date, kind, category, amount_sum, tx_count)
+        VALUES (NEW.date, NEW.kind, NEW.category, NEW.amount_cents, 1)
+        ON CONFLICT (date, kind, category) DO UPDATE SET
+            amount_sum = amount_sum + excluded.amount_sum,
+            tx_count = tx_count + 1;
+    END;
+    """
+    + REBUILD_ROLLUPS_SQL,
+    # 6: полнотекстовый индекс FTS5 по описанию и категории; таблица
+    # внешнего содержимого (текст не дублируется), синхронизация — триггерами
+    """
+    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+        description,
+        category,
+        content = 'transactions',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER trg_transactions_fts_insert
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (rowid, description, category)
+        VALUES (NEW.id, NEW.description, NEW.category);
+    END;
+
+    CREATE TRIGGER trg_transactions_fts_delete
+    AFTER DELETE ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+        VALUES ('delete', OLD.id, OLD.description, OLD.category);
+    END;
+
+    CREATE TRIGGER trg_transactions_fts_update
+    AFTER UPDATE OF description, category ON transactions
+    BEGIN
+        INSERT INTO transactions_fts (transactions_fts, rowid, description, category)
+        VALUES ('delete', OLD.id, OLD.description, OLD.category);
+        INSERT INTO transactions_fts (rowid, description, category)
+        VALUES (NEW.id, NEW.description, NEW.category);
+    END;
+
+    INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild');
+    """,
+    # 7: дневное сальдо и нарастающий баланс для balance --at/--series
+    """
+    CREATE TABLE daily_balance (
+        date TEXT PRIMARY KEY,
+        net INTEGER NOT NULL,
+        tx_count INTEGER NOT NULL,
+        balance INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE balance_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        dirty_from TEXT
+    );
+    INSERT INTO balance_state (id, dirty_from) VALUES (1, NULL);
+
+    CREATE TRIGGER trg_daily_balance_insert
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT INTO daily_balance (date, net, tx_count, balance)
+        VALUES (
+            NEW.date,
+            CASE WHEN NEW.kind = 'income' THEN NEW.amount_cents
+                 ELSE -NEW.amount_cents END,
+            1,
+            0
+        )
+        ON CONFLICT (date) DO UPDATE SET
+            net = net + excluded.net,
+            tx_count = tx_count + 1;
+        UPDATE balance_state SET dirty_from = NEW.date
+        WHERE dirty_from IS NULL OR dirty_from > NEW.date;
+    END;
+
+    CREATE TRIGGER trg_daily_balance_delete
+    AFTER DELETE ON transactions
+    BEGIN
+        UPDATE daily_balance SET
+            net = net - CASE WHEN OLD.kind = 'income' THEN OLD.amount_cents
+                             ELSE -OLD.amount_cents END,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date;
+        DELETE FROM daily_balance WHERE date = OLD.date AND tx_count <= 0;
+        UPDATE balance_state SET dirty_from = OLD.date
+        WHERE dirty_from IS NULL OR dirty_from > OLD.date;
+    END;
+
+    CREATE TRIGGER trg_daily_balance_update
+    AFTER UPDATE OF date, amount_cents, kind ON transactions
+    BEGIN
+        UPDATE daily_balance SET
+            net = net - CASE WHEN OLD.kind = 'income' THEN OLD.amount_cents
+                             ELSE -OLD.amount_cents END,
+            tx_count = tx_count - 1
+        WHERE date = OLD.date;
+        DELETE FROM daily_balance WHERE date = OLD.date AND tx_count <= 0;
+        INSERT INTO daily_balance (date, net, tx_count, balance)
+        VALUES (
+            NEW.date,
+            CASE WHEN NEW.kind = 'income' THEN NEW.amount_cents
+                 ELSE -NEW.amount_cents END,
+            1,
+            0
+        )
+        ON CONFLICT (date) DO UPDATE SET
+            net = net + excluded.net,
+            tx_count = tx_count + 1;
+        UPDATE balance_state SET dirty_from = MIN(OLD.date, NEW.date)
+        WHERE dirty_from IS NULL OR dirty_from > MIN(OLD.date, NEW.date);
+    END;
+    """
+    + REBUILD_BALANCE_SQL,
+    # 8: сегменты очереди записи (tracker.spool), уже перенесённые в базу
+    """
+    CREATE TABLE spool_applied (
+        name TEXT PRIMARY KEY
+    ) WITHOUT ROWID;
+    """,
+]
+
+
+def _transaction_row(tx: Transaction) -> tuple:
+    return (
+        tx.date.isoformat(),
+        to_cents(tx.amount),
+        tx.kind,
+        tx.category,
+        tx.description,
+        tx.created_at.isoformat(timespec="seconds"),
+    )
+
+
+def _period_conditions(
+    from_date: Optional[date], to_date: Optional[date]
+) -> Tuple[List[str], list]:
+    conditions = []
+    params: list = []
+
+    if from_date:
+        conditions.append("date >= ?")
+        params.append(from_date.isoformat())
+
+    if to_date:
+        conditions.append("date <= ?")
+        params.append(to_date.isoformat())
+
+    return conditions, params
+
+
+def fts_query(text: str) -> str:
+    # Обычный текст -> запрос FTS5: каждое слово ищется как префикс,
+    # все слова обязательны. Кавычки экранируются, поэтому операторы
+    # FTS5 (OR, NOT, *, скобки) в тексте пользователя не срабатывают.
+    terms = [word.replace('"', '""') for word in text.split()]
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _sql_statements(script: str) -> List[str]:
+    # Скрипт по одному запросу — чтобы выполнить его в уже открытой
+    # транзакции (executescript сначала фиксирует текущую). Конец запроса
+    # определяет sqlite3.complete_statement, поэтому «;» внутри
+    # BEGIN ... END триггеров запрос не разрывает.
+    statements = []
+    current = ""
+    for piece in script.split(";"):
+        current += piece + ";"
+        if sqlite3.complete_statement(current):
+            if current.strip("; \n"):
+                statements.append(current.strip())
+            current = ""
+    return statements
+
+
+def _is_busy(exc: sqlite3.OperationalError) -> bool:
+    # sqlite_errorcode есть с Python 3.11, раньше различаем по тексту
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in BUSY_ERROR_CODES
+    message = str(exc)
+    return "locked" in message or "busy" in message
+
+
+def _signed_cents(kind: str, amount_cents: int) -> int:
+    return amount_cents if kind == "income" else -amount_cents
+
+
+def _row_to_transaction(row: tuple) -> Transaction:
+    row_id, date_str, amount_cents, kind, cat, descr, created_at_str = row
+    return Transaction(
+        id=row_id,
+        date=date.fromisoformat(date_str),
+        amount=from_cents(amount_cents),
+        kind=kind,
+        category=cat,
+        description=descr or "",
+        created_at=datetime.fromisoformat(created_at_str),
+    )
 
 
 class Storage:
-    def __init__(self, db_path: Path) -> None:
+    def __init__(
+        self,
+        db_path: Path,
+        journal_mode: Optional[str] = None,
+        synchronous: Optional[str] = None,
+        cache_size_kib: Optional[int] = None,
+        mmap_size: Optional[int] = None,
+        timings: Optional[Timings] = None,
+        busy_timeout: Optional[float] = None,
+        write_retries: int = 0,
+    ) -> None:
+        if journal_mode is not None and journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Неизвестный journal_mode: {journal_mode!r}")
+        if synchronous is not None and synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Неизвестный synchronous: {synchronous!r}")
+
         self.db_path = Path(db_path)
-        self._ensure_db()
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self.write_retries = write_retries
+        # сколько раз BEGIN IMMEDIATE повторялся из-за чужой блокировки
+        self.busy_retries = 0
+        # замеры по этапам для --timings (None — без замеров)
+        self.timings = timings
+        self._conn: Optional[sqlite3.Connection] = None
+        # баланс по дням в памяти (см. balance_index); пока не загружен — None
+        self._balance_index: Optional[BalanceIndex] = None
+        # PRAGMA data_version на момент загрузки индекса
+        self._balance_data_version = 0
+        # вложенность grouped_commits; > 0 — записи не фиксируются сразу
+        self._group_depth = 0
+        with stage(timings, "connect"):
+            self._connect()
+        with stage(timings, "schema"):
+            self._ensure_db()
+
+    def __enter__(self) -> "Storage":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        # data_version нового соединения с прежним не сравнить
+        self._balance_index = None
 
     def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        # Одно соединение на весь срок жизни Storage: открытие файла
+        # и настройка PRAGMA оплачиваются один раз, а не на каждый вызов.
+        if self._conn is None:
+            timeout = self.busy_timeout
+            if timeout is None:
+                timeout = DEFAULT_BUSY_TIMEOUT
+            conn = sqlite3.connect(self.db_path, timeout=timeout)
+            self._apply_pragmas(conn)
+            self._conn = conn
+        return self._conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        # По умолчанию настройки SQLite не трогаем: WAL, synchronous=NORMAL
+        # и т.п. включаются явно, когда скорость важнее надёжности.
+        if self.journal_mode is not None:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        if self.synchronous is not None:
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if self.cache_size_kib is not None:
+            # отрицательное значение cache_size задаётся в KiB, а не в страницах
+            conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kib)}")
+        if self.mmap_size is not None:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
 
     def _ensure_db(self) -> None:
+        # Версия схемы хранится в PRAGMA user_version; при открытии
+        # старого finance.db недостающие миграции применяются по очереди.
         conn = self._connect()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+        # Миграции — под блокировкой записи, а версия перечитывается уже
+        # под ней: если старую базу одновременно открыли несколько
+        # процессов, каждая миграция выполнится один раз.
+        self._begin(conn)
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    amount REAL NOT NULL,
-                    kind TEXT NOT NULL,
-                    category TEXT NOT NULL,
-                    description TEXT,
-                    created_at TEXT NOT NULL
-                )
-                """
-            )
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in _sql_statements(script):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
             conn.commit()
-        finally:
-            conn.close()
+        except BaseException:
+            conn.rollback()
+            raise
 
-    def add_transaction(self, tx: Transaction) -> Transaction:
+    def _begin(self, conn: sqlite3.Connection) -> None:
+        # Запись всегда начинается с BEGIN IMMEDIATE: блокировка берётся
+        # сразу (ожидая до busy timeout), а не посреди транзакции — там
+        # SQLite при занятой базе сразу отвечает «database is locked».
+        # Если не дождались, повторяем до write_retries раз со случайной
+        # задержкой, чтобы ждущие процессы не просыпались одновременно.
+        attempt = 0
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as exc:
+                if attempt >= self.write_retries or not _is_busy(exc):
+                    raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt)
+            time.sleep(random.uniform(0, delay))
+            attempt += 1
+            self.busy_retries += 1
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        # Внутри grouped_commits фиксирует группа, иначе — каждая запись сама.
+        conn = self._connect()
+        if self._group_depth:
+            yield conn
+            return
+        self._begin(conn)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    @contextmanager
+    def grouped_commits(self) -> Iterator[None]:
+        # Все записи внутри блока фиксируются одним COMMIT в конце или
+        # откатываются вместе при исключении (пакетный режим CLI).
+        conn = self._connect()
+        if self._group_depth == 0 and not conn.in_transaction:
+            self._begin(conn)
+        self._group_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                conn.rollback()
+                self._balance_index = None
+            raise
+        else:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                with stage(self.timings, "write"):
+                    conn.commit()
+
+    @contextmanager
+    def savepoint(self) -> Iterator[None]:
+        # Откат одной команды внутри grouped_commits без отката всей группы.
         conn = self._connect()
+        conn.execute("SAVEPOINT command")
         try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK TO command")
+            conn.execute("RELEASE command")
+            # индекс мог учесть откаченные строки — построится заново
+            self._balance_index = None
+            raise
+        else:
+            conn.execute("RELEASE command")
+
+    def add_transaction(self, tx: Transaction) -> Transaction:
+        with stage(self.timings, "write"), self._write() as conn:
             cursor = conn.cursor()
 
-            cursor.execute(
-                """
-                INSERT INTO transactions (date, amount, kind, category, description, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    tx.date.isoformat(),
-                    tx.amount,
-                    tx.kind,
-                    tx.category,
-                    tx.description,
-                    tx.created_at.isoformat(timespec="seconds"),
-                ),
+            cursor.execute(INSERT_TRANSACTION_SQL, _transaction_row(tx))
+        new_id = cursor.lastrowid
+        if self._balance_index is not None:
+            self._balance_index.add(
+                tx.date.toordinal(), _signed_cents(tx.kind, to_cents(tx.amount))
             )
-            conn.commit()
-            new_id = cursor.lastrowid
-            return Transaction(
-                id=new_id,
-                date=tx.date,
-                amount=tx.amount,
-                kind=tx.kind,
-                category=tx.category,
-                description=tx.description,
-                created_at=tx.created_at,
+        return Transaction(
+            id=new_id,
+            date=tx.date,
+            amount=tx.amount,
+            kind=tx.kind,
+            category=tx.category,
+            description=tx.description,
+            created_at=tx.created_at,
+        )
+
+    def add_transactions(
+        self,
+        transactions: Iterable[Transaction],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> int:
+        # Все строки пишутся одной транзакцией: либо импорт целиком,
+        # либо ничего. Вход читается лениво, пачками по chunk_size.
+        rows = map(_transaction_row, transactions)
+        count = 0
+        index = self._balance_index
+        # дельты баланса по дням — в индекс только после фиксации
+        deltas: Dict[int, int] = {}
+        with self._write() as conn:
+            cursor = conn.cursor()
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                with stage(self.timings, "write"):
+                    cursor.executemany(INSERT_TRANSACTION_SQL, chunk)
+                if index is not None:
+                    for date_str, cents, kind, *_ in chunk:
+                        day = date.fromisoformat(date_str).toordinal()
+                        deltas[day] = deltas.get(day, 0) + _signed_cents(kind, cents)
+                count += len(chunk)
+        for day, delta in deltas.items():
+            index.add(day, delta)
+        return count
+
+    def iter_transactions(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        category: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        after_id: Optional[int] = None,
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Transaction]:
+        # Строки читаются с курсора пачками по batch_size, так что первая
+        # транзакция доступна сразу, а память не растёт с размером базы.
+        # after_id — keyset-пагинация: строки строго после транзакции
+        # after_id в порядке (date, id), без сканирования OFFSET.
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        query = """
+            SELECT id, date, amount_cents, kind, category, description, created_at
+            FROM transactions
+        """
+        conditions, params = _period_conditions(from_date, to_date)
+
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+
+        if after_id is not None:
+            conditions.append(
+                "(date, id) > (SELECT date, id FROM transactions WHERE id = ?)"
             )
+            params.append(after_id)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        query += " ORDER BY date ASC, id ASC"
+
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset])
+
+        timings = self.timings
+        try:
+            with stage(timings, "query"):
+                cursor.execute(query, params)
+            while True:
+                with stage(timings, "query"):
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                # этапы не должны захватывать yield — иначе в них попадёт
+                # время потребителя (например, печати)
+                with stage(timings, "convert"):
+                    transactions = [_row_to_transaction(row) for row in rows]
+                yield from transactions
         finally:
-            conn.close()
+            cursor.close()
+
+    def search_transactions(
+        self,
+        query: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        raw: bool = False,
+        order: str = "rank",
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Transaction]:
+        # Полнотекстовый поиск по описанию и категории. raw=True — query
+        # передаётся в синтаксисе FTS5 как есть.
+        # order="rank" оценивает (bm25) все совпадения, поэтому время растёт
+        # с их числом; order="recent" идёт по rowid индекса с конца и
+        # останавливается на limit — быстро даже для частых слов.
+        if order not in SEARCH_ORDERS:
+            raise ValueError(f"Неизвестный порядок поиска: {order!r}")
+        match = query if raw else fts_query(query)
+        if not match:
+            return
+
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        sql = """
+            SELECT t.id, t.date, t.amount_cents, t.kind, t.category,
+                   t.description, t.created_at
+            FROM transactions_fts AS f
+            JOIN transactions AS t ON t.id = f.rowid
+            WHERE transactions_fts MATCH ?
+        """
+        params: list = [match]
+        conditions, period_params = _period_conditions(from_date, to_date)
+        for condition in conditions:
+            sql += " AND t." + condition
+        params.extend(period_params)
+
+        if order == "rank":
+            sql += " ORDER BY f.rank, t.date DESC, t.id DESC"
+        else:
+            sql += " ORDER BY f.rowid DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        timings = self.timings
+        try:
+            with stage(timings, "query"):
+                cursor.execute(sql, params)
+            while True:
+                with stage(timings, "query"):
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                with stage(timings, "convert"):
+                    transactions = [_row_to_transaction(row) for row in rows]
+                yield from transactions
+        finally:
+            cursor.close()
 
     def list_transactions(
         self,
@@ -74,51 +786,231 @@ class Storage:
         to_date: Optional[date] = None,
         category: Optional[str] = None,
     ) -> List[Transaction]:
+        return list(
+            self.iter_transactions(
+                from_date=from_date,
+                to_date=to_date,
+                category=category,
+            )
+        )
+
+    def load_batch(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        category: Optional[str] = None,
+        batch_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> TransactionBatch:
+        # Дата переводится в ordinal прямо в SQL (julianday 0001-01-01
+        # равен 1721425.5), чтобы не разбирать строку даты в Python.
         conn = self._connect()
+        cursor = conn.cursor()
+
+        query = """
+            SELECT id, CAST(julianday(date) - 1721424.5 AS INTEGER),
+                   amount_cents, kind, category
+            FROM transactions
+        """
+        conditions, params = _period_conditions(from_date, to_date)
+
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        query += " ORDER BY date ASC, id ASC"
+
+        batch = TransactionBatch()
+        append = batch.append
+        timings = self.timings
         try:
-            cursor = conn.cursor()
+            with stage(timings, "query"):
+                cursor.execute(query, params)
+            while True:
+                with stage(timings, "query"):
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                with stage(timings, "convert"):
+                    for row in rows:
+                        append(*row)
+        finally:
+            cursor.close()
+        return batch
 
+    def summarize(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        use_rollup: bool = True,
+    ) -> Dict[str, Any]:
+        # Агрегация целиком в SQLite: в Python приходит по строке на пару
+        # (kind, category), поэтому память не зависит от числа транзакций.
+        # По умолчанию читаются дневные итоги daily_totals — стоимость
+        # пропорциональна числу дней в периоде, а не числу транзакций.
+        conn = self._connect()
+
+        if use_rollup:
+            query = """
+                SELECT kind, category, SUM(amount_sum)
+                FROM daily_totals
+            """
+        else:
             query = """
-                SELECT id, date, amount, kind, category, description, created_at
+                SELECT kind, category, SUM(amount_cents)
                 FROM transactions
             """
-            conditions = []
-            params: list = []
-
-            if from_date:
-                conditions.append("date >= ?")
-                params.append(from_date.isoformat())
-
-            if to_date:
-                conditions.append("date <= ?")
-                params.append(to_date.isoformat())
-
-            if category:
-                conditions.append("category = ?")
-                params.append(category)
-
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-
-            query += " ORDER BY date ASC, id ASC"
-
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-
-            result: List[Transaction] = []
-            for row in rows:
-                row_id, date_str, amount, kind, cat, descr, created_at_str = row
-                result.append(
-                    Transaction(
-                        id=row_id,
-                        date=date.fromisoformat(date_str),
-                        amount=float(amount),
-                        kind=kind,
-                        category=cat,
-                        description=descr or "",
-                        created_at=datetime.fromisoformat(created_at_str),
-                    )
+        conditions, params = _period_conditions(from_date, to_date)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        query += " GROUP BY kind, category"
+
+        with stage(self.timings, "query"):
+            return summary_from_groups(conn.execute(query, params))
+
+    def summary_report(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        engine: str = "sql",
+        period: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[List[SeriesRow]]]:
+        # Сводка и (если задан period) динамика за период. engine="sql" —
+        # агрегация в SQLite по дневным итогам, python/numpy — в памяти
+        # по колоночной выборке.
+        batch = None
+        if engine != "sql" or period:
+            batch = self.load_batch(from_date=from_date, to_date=to_date)
+
+        if engine == "sql":
+            summary = self.summarize(from_date=from_date, to_date=to_date)
+        else:
+            with stage(self.timings, "compute"):
+                summary = compute_summary(batch, engine=engine)
+
+        series = None
+        if period:
+            if engine == "sql":
+                engine = "numpy" if HAS_NUMPY else "python"
+            with stage(self.timings, "compute"):
+                series = compute_series(batch, period, engine=engine)
+        return summary, series
+
+    def balance_index(self) -> BalanceIndex:
+        # Баланс по дням в памяти: строится один раз за O(дней) из
+        # daily_balance.net, дальше add_transaction(s) этого Storage
+        # обновляют его сами за O(log n) на день — удобно, когда запросы
+        # баланса перемежаются вставками задним числом (shell, --batch).
+        # Если базу изменило другое соединение (PRAGMA data_version),
+        # индекс строится заново.
+        conn = self._connect()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._balance_data_version:
+            self._balance_index = None
+        if self._balance_index is None:
+            self._balance_data_version = data_version
+            with stage(self.timings, "query"):
+                rows = conn.execute(
+                    """
+                    SELECT CAST(julianday(date) - 1721424.5 AS INTEGER), net
+                    FROM daily_balance
+                    ORDER BY date
+                    """
                 )
-            return result
+                self._balance_index = BalanceIndex(rows)
+        return self._balance_index
+
+    def _repair_balances(self) -> None:
+        # Пересчёт нарастающего баланса от самого раннего изменённого дня.
+        # Обычная запись «сегодняшним числом» стоит пересчёта одного дня.
+        conn = self._connect()
+        dirty_from = conn.execute("SELECT dirty_from FROM balance_state").fetchone()[0]
+        if dirty_from is None:
+            return
+        if conn.in_transaction:
+            # внутри grouped_commits — в той же транзакции
+            with stage(self.timings, "write"):
+                conn.execute(REPAIR_BALANCE_SQL, {"dirty_from": dirty_from})
+                conn.execute("UPDATE balance_state SET dirty_from = NULL")
+            return
+        try:
+            with stage(self.timings, "write"):
+                self._begin(conn)
+                row = conn.execute("SELECT dirty_from FROM balance_state").fetchone()
+                if row[0] is not None:
+                    conn.execute(REPAIR_BALANCE_SQL, {"dirty_from": row[0]})
+                    conn.execute("UPDATE balance_state SET dirty_from = NULL")
+                conn.commit()
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def balance_at(self, day: date) -> float:
+        # Баланс (доходы минус расходы) на конец дня: поиск по первичному
+        # ключу daily_balance, O(log n). Если индекс в памяти уже загружен,
+        # отвечает он.
+        if self._balance_index is not None:
+            index = self.balance_index()
+            return from_cents(index.balance_at(day.toordinal()))
+        self._repair_balances()
+        conn = self._connect()
+        with stage(self.timings, "query"):
+            row = conn.execute(
+                """
+                SELECT balance FROM daily_balance
+                WHERE date <= ?
+                ORDER BY date DESC
+                LIMIT 1
+                """,
+                (day.isoformat(),),
+            ).fetchone()
+        return from_cents(row[0]) if row else 0.0
+
+    def iter_balance_series(
+        self,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        batch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[Tuple[date, float, float]]:
+        # (день, сальдо за день, баланс на конец дня) по дням с транзакциями
+        self._repair_balances()
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        query = "SELECT date, net, balance FROM daily_balance"
+        conditions, params = _period_conditions(from_date, to_date)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date"
+
+        timings = self.timings
+        try:
+            with stage(timings, "query"):
+                cursor.execute(query, params)
+            while True:
+                with stage(timings, "query"):
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                with stage(timings, "convert"):
+                    series = [
+                        (date.fromisoformat(day), from_cents(net), from_cents(balance))
+                        for day, net, balance in rows
+                    ]
+                yield from series
         finally:
-            conn.close()
+            cursor.close()
+
+    def rebuild_rollups(self) -> int:
+        with stage(self.timings, "write"), self._write() as conn:
+            for statement in _sql_statements(REBUILD_ROLLUPS_SQL + REBUILD_BALANCE_SQL):
+                conn.execute(statement)
+        self._balance_index = None
+        self._repair_balances()
+        row = conn.execute("SELECT COUNT(DISTINCT date) FROM daily_totals").fetchone()
+        return row[0]